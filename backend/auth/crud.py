@@ -1,14 +1,42 @@
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from backend.auth import models
+from backend.cache import TTLCache
 from passlib.context import CryptContext
+import os
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified token -> detached User, so known tokens skip both the JWT
+# signature check and the users lookup
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "300")),
+)
+
+def invalidate_user(user_id: int):
+    principal_cache.discard_where(lambda user: user.id == user_id)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _drop_cached_principal(mapper, connection, target):
+    invalidate_user(target.id)
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def create_user(db: Session, username: str, password: str, level: int = 0):
-    hashed = pwd_context.hash(password)
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def create_user(
+    db: Session,
+    username: str,
+    password: str | None = None,
+    level: int = 0,
+    hashed_password: str | None = None,
+):
+    # Async callers hash in a worker thread beforehand and pass `hashed_password`
+    hashed = hashed_password or hash_password(password)
     user = models.User(username=username, hashed_password=hashed)
     # check if there is users then set level to 1, otherwise set to 0
     existing_user = db.query(models.User).first()
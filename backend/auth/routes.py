@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.auth import schemas, crud, models
-from backend.database import SessionLocal
+from backend.database import get_async_db
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+import time
 
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from backend.auth.models import User
@@ -16,23 +18,20 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 router = APIRouter(prefix="/auth")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if crud.get_user_by_username(db, user.username):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.run_sync(crud.get_user_by_username, user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db, user.username, user.password)
+    # bcrypt is CPU-bound: keep it off the event loop
+    hashed_password = await run_in_threadpool(crud.hash_password, user.password)
+    return await db.run_sync(crud.create_user, user.username, hashed_password=hashed_password)
 
 @router.post("/login", response_model=schemas.Token)
-def login(user: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, user.username)
-    if not db_user or not crud.verify_password(user.password, db_user.hashed_password):
+async def login(user: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.run_sync(crud.get_user_by_username, user.username)
+    if not db_user or not await run_in_threadpool(
+        crud.verify_password, user.password, db_user.hashed_password
+    ):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token_data = {
@@ -42,13 +41,17 @@ def login(user: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get
     token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
     return {"access_token": token, "token_type": "bearer"}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    user = crud.principal_cache.get(token)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -57,11 +60,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_user_by_username(db, username)
+    user = await db.run_sync(crud.get_user_by_username, username)
     if user is None:
         raise credentials_exception
+
+    # Detached so commits later in this request can't expire the shared instance;
+    # never cached beyond the token's own expiry (the cache's TTL if it has none)
+    db.expunge(user)
+    exp = payload.get("exp")
+    crud.principal_cache.set(token, user, ttl=None if exp is None else exp - time.time())
     return user
 
 @router.get("/me", response_model=schemas.UserOut)
 def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
+
+@router.get("/cache/stats", response_model=schemas.CacheStats)
+def read_cache_stats(current_user: User = Depends(get_current_user)):
+    return crud.principal_cache.stats()
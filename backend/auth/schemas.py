@@ -16,3 +16,12 @@ class UserOut(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
@@ -1,6 +1,12 @@
 import subprocess
 import shutil
 import os
+import sys
+
+# Also run as `python backend/build_frontend.py` before the package is installed
+# (Dockerfile, install.sh), when sys.path[0] is backend/: put the repo root first
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.precompress import precompress  # standard library only
 
 def build_vue():
     print("[+] Building frontend...")
@@ -19,10 +25,18 @@ def build_vue():
         # Copy new build
         dist_dir = os.path.join(frontend_dir, "dist")
         shutil.copytree(dist_dir, static_dir, dirs_exist_ok=True)
+
+        # Compressed variants, served by PrecompressedStaticFiles per Accept-Encoding
+        print(f"[+] Precompressed {precompress(static_dir)} static files.")
         print("[✓] Frontend built successfully.")
     except Exception as e:
         print(f"[!] Error building frontend: {e}")
 
 if __name__ == "__main__":
-    build_vue()
+    if "--precompress" in sys.argv:
+        # Only (re)compress an existing build in backend/static
+        static_dir = os.path.join(os.path.dirname(__file__), "static")
+        print(f"[+] Precompressed {precompress(static_dir)} static files.")
+    else:
+        build_vue()
     print("[+] Frontend build script executed directly.")
@@ -1,16 +1,130 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Optional read-only replica for GET routes; unset means reads use the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or None
 
-# Remove `check_same_thread` if not SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+# Storage profile: "tuned" applies the settings below, "default" leaves
+# SQLAlchemy's and the database's own defaults alone
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+
+# SQLite: WAL lets readers run alongside the single writer; NORMAL sync is
+# durable in WAL mode except on power loss; writers wait instead of failing
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),  # negative = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+# Server databases: per-process pool sizing, recycling and liveness checks
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") != "0",
+}
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _engine_options(url: str) -> dict:
+    if _is_sqlite(url):
+        # Remove `check_same_thread` if not SQLite
+        return {"connect_args": {"check_same_thread": False}}
+    return dict(POOL_OPTIONS) if DB_PROFILE == "tuned" else {}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _configure(engine, url: str):
+    if _is_sqlite(url) and DB_PROFILE == "tuned":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def make_engine(url: str):
+    return _configure(create_engine(url, **_engine_options(url)), url)
+
+
+engine = make_engine(DATABASE_URL)
+read_engine = make_engine(READ_DATABASE_URL) if READ_DATABASE_URL else engine
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
\ No newline at end of file
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+Base = declarative_base()
+
+# Async drivers used for the request path, keyed by the dialect in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    return f"{driver}://{rest}" if driver else url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+def make_async_engine(url: str):
+    options = {} if _is_sqlite(url) else _engine_options(url)
+    async_engine = create_async_engine(url, **options)
+    _configure(async_engine.sync_engine, url)
+    return async_engine
+
+
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+async_read_engine = make_async_engine(to_async_url(READ_DATABASE_URL)) if READ_DATABASE_URL else async_engine
+
+# expire_on_commit=False: handlers serialize ORM objects after the commit, and
+# an expired attribute can't lazy-load outside the greenlet bridge
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    # The sync crud functions run on this session's connection via
+    # `await db.run_sync(crud.fn, ...)`, so there is a single implementation
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    # For routes that only read: served by READ_DATABASE_URL when it is set.
+    # A replica may lag the primary by a moment, so a write is not always
+    # visible to the very next read.
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add columns and indexes introduced since
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"
+                    )
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
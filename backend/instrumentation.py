@@ -0,0 +1,253 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("backend.instrumentation")
+
+# Set METRICS_ENABLED=0 to skip the middleware and engine hooks entirely
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Requests slower than this are logged with their SQL breakdown; 0 disables the log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# The same statement run this many times in one request is reported as an N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    # Cumulative-bucket histogram in the Prometheus text format, keyed by label values
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = _labels(self.labels, label_values)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                total += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {total}')
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {total}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _labels(names, values) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route, including streamed bodies",
+    ("method", "route", "status"),
+)
+REQUEST_STATEMENTS = Histogram(
+    "db_statements_per_request", "SQL statements executed per request", ("route",), COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram("db_time_per_request_seconds", "Time spent in SQL per request", ("route",))
+POOL_HOLD = Histogram(
+    "db_connection_held_seconds", "Time a pooled connection stays checked out", ("engine",),
+    (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_CONNECTS = CounterMetric("db_pool_connections_opened_total", "New database connections opened by the pool", ("engine",))
+N_PLUS_ONE = CounterMetric("db_n_plus_one_requests_total", "Requests that repeated one statement at least N_PLUS_ONE_THRESHOLD times", ("route",))
+SLOW_REQUESTS = CounterMetric("http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", ("route",))
+METRICS = (REQUEST_LATENCY, REQUEST_STATEMENTS, REQUEST_SQL_TIME, POOL_HOLD, POOL_CONNECTS, N_PLUS_ONE, SLOW_REQUESTS)
+
+_engines = {}  # label -> Engine, for the pool gauges
+
+
+# ---- per-request SQL accounting ----
+
+class RequestStats:
+    __slots__ = ("statements", "sql_time", "connection_time", "counts")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_time = 0.0
+        self.connection_time = 0.0  # connections held checked out
+        self.counts = Counter()  # statement text -> executions
+
+
+# Holds a mutable RequestStats, so work in threadpool copies of the context
+# (sync routes, run_sync, streamed bodies) still adds to the request's totals
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.sql_time += time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.counts[statement] += 1
+
+
+def _pool_listeners(label: str) -> dict:
+    # Pool events: "connect" for each new DBAPI connection, "checkout"/"checkin"
+    # around every use. A pool that runs dry shows up as long holds plus checked-out
+    # connections at the pool size (see the gauge below).
+    def on_connect(dbapi_connection, connection_record):
+        POOL_CONNECTS.inc(label)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def on_checkin(dbapi_connection, connection_record):
+        start = connection_record.info.pop("checked_out_at", None)
+        if start is None:
+            return
+        held = time.perf_counter() - start
+        POOL_HOLD.observe(held, label)
+        stats = _current.get()
+        if stats is not None:
+            stats.connection_time += held
+
+    return {"connect": on_connect, "checkout": on_checkout, "checkin": on_checkin}
+
+
+def instrument_engine(engine: Engine, label: str):
+    if not ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    for name, listener in _pool_listeners(label).items():
+        event.listen(engine, name, listener)
+    _engines[label] = engine
+
+
+# ---- ASGI middleware ----
+
+class InstrumentationMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware, so streamed responses are timed
+    # until their last chunk and nothing is buffered
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _record(scope, status[0], time.perf_counter() - start, stats)
+
+
+def _route(scope) -> str:
+    # Labelled by handler ("proj.get_tasks"): the matched endpoint is in the scope on
+    # every Starlette/FastAPI version, unlike the route object. Static files and
+    # 404s share one label to keep cardinality bounded.
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__name__", None)
+    if name is None:
+        return "other"
+    module = endpoint.__module__.removesuffix(".routes").rsplit(".", 1)[-1]
+    return f"{module}.{name}"
+
+
+def _record(scope, status: int, elapsed: float, stats: RequestStats):
+    route = _route(scope)
+    REQUEST_LATENCY.observe(elapsed, scope["method"], route, str(status))
+    REQUEST_STATEMENTS.observe(stats.statements, route)
+    REQUEST_SQL_TIME.observe(stats.sql_time, route)
+
+    repeated = stats.counts.most_common(1)
+    if repeated and repeated[0][1] >= N_PLUS_ONE_THRESHOLD:
+        N_PLUS_ONE.inc(route)
+        statement, count = repeated[0]
+        logger.warning("N+1 on %s %s: %d x %s", scope["method"], route, count, " ".join(statement.split())[:200])
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(route)
+        logger.warning(
+            "slow request %s %s -> %d in %.0f ms (%d statements, %.0f ms SQL, %.0f ms holding connections)",
+            scope["method"], scope["path"], status, elapsed * 1000,
+            stats.statements, stats.sql_time * 1000, stats.connection_time * 1000,
+        )
+
+
+# ---- exposition ----
+
+def _pool_gauges() -> list[str]:
+    lines = [
+        "# HELP db_pool_checked_out Connections currently checked out of the pool",
+        "# TYPE db_pool_checked_out gauge",
+    ]
+    for label, engine in sorted(_engines.items()):
+        checkedout = getattr(engine.pool, "checkedout", None)
+        if checkedout is not None:
+            lines.append(f'db_pool_checked_out{{engine="{label}"}} {checkedout()}')
+    return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_pool_gauges())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+from sqlalchemy.orm import Session
+from backend.jobs import runner
+from backend.proj import crud, agreement, latest, event_store, search, consensus, diffs, stats, assignment, dedup
+
+# One function per job kind, run in a worker process with its own session:
+# handler(db, ctx, job) -> result dict. `ctx.progress(done, total)` records
+# progress and raises JobCancelled once a cancel was requested.
+
+
+class _ProgressFile:
+    # Read-through wrapper reporting bytes consumed from an upload
+    def __init__(self, file, ctx, size: int):
+        self.file = file
+        self.ctx = ctx
+        self.size = size
+
+    def read(self, n: int = -1):
+        data = self.file.read(n)
+        self.ctx.progress(self.file.tell(), self.size)
+        return data
+
+
+def upload(db: Session, ctx, job) -> dict:
+    path = runner.upload_path(job.id)
+    with open(path, "rb") as f:
+        return crud.create_task_from_file(
+            db,
+            project_id=job.project_id,
+            file=_ProgressFile(f, ctx, os.path.getsize(path)),
+            filename=job.params.get("filename"),
+            duplicates=job.params.get("duplicates", dedup.FLAG),
+        )
+
+
+def export(db: Session, ctx, job) -> dict:
+    # Same rows as GET /projects/{id}/export, written to the job's result file
+    compress = bool(job.params.get("gzip"))
+    path = ctx.result_path(".jsonl.gz" if compress else ".jsonl")
+    total = stats.get_project_stats(db, job.project_id)["reviewed_tasks"]
+    rows = 0
+    with (gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")) as out:
+        for row in crud.iter_project_export(db, job.project_id):
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            rows += 1
+            if rows % crud.EXPORT_CHUNK_SIZE == 0:
+                ctx.progress(rows, total)
+    ctx.progress(rows, rows)
+    return {"rows": rows, "bytes": os.path.getsize(path)}
+
+
+def agreement_report(db: Session, ctx, job) -> dict:
+    # Scored in this worker: a job process doesn't start a pool of its own
+    return agreement.compute_agreement(db, job.project_id, workers=1)
+
+
+REBUILD_STEPS = (
+    # Dependency order: everything below reads the latest-review pointers.
+    # "events" also recomputes the span offsets
+    ("duplicates", dedup.rebuild_project),
+    ("latest_reviews", latest.rebuild_project),
+    ("events", event_store.reindex_project),
+    ("search", search.reindex_project),
+    ("consensus", consensus.rebuild_project_consensus),
+    ("corrections", diffs.rebuild_project_diffs),
+    ("stats", stats.rebuild_project_stats),
+    ("queue", assignment.rebuild_queue),
+)
+
+
+def reindex(db: Session, ctx, job) -> dict:
+    # Re-derives every per-task table of the project; each step commits
+    counts = {}
+    for done, (name, rebuild) in enumerate(REBUILD_STEPS):
+        ctx.progress(done, len(REBUILD_STEPS))
+        counts[name] = rebuild(db, job.project_id)
+    ctx.progress(len(REBUILD_STEPS), len(REBUILD_STEPS))
+    return counts
+
+
+HANDLERS = {
+    "upload": upload,
+    "export": export,
+    "agreement": agreement_report,
+    "reindex": reindex,
+}
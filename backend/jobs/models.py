@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, JSON
+from backend.database import Base
+from datetime import datetime
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job(Base):
+    # A long operation run by the worker pool; the row is the only channel
+    # between the API process and the worker (progress, cancellation, result)
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)
+    project_id = Column(Integer, nullable=True)
+    owner_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default=QUEUED)
+    params = Column(JSON, nullable=True)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)  # NULL while unknown
+    result = Column(JSON, nullable=True)
+    result_path = Column(String, nullable=True)  # file produced by the job, served by /jobs/{id}/result
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # touched by the worker while it runs
+
+    __table_args__ = (
+        Index("ix_jobs_project_id_created_at", "project_id", "created_at"),
+        Index("ix_jobs_status", "status"),
+    )
+
+    @property
+    def has_file(self) -> bool:
+        return self.result_path is not None
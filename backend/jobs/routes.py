@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Literal
+from backend.jobs import schemas, runner
+from backend.proj import crud, dedup
+from backend.proj.routes import get_db
+from backend.database import get_async_db
+from backend.auth.routes import get_current_user
+from backend.auth.models import User
+import os
+
+router = APIRouter()
+
+# Enqueueing returns 202 with the job at once; the work runs in the job worker
+# pool (runner.JOB_WORKERS processes) and is followed through GET /jobs/{id}
+
+def _require_project(db: Session, project_id: int):
+    if not crud.get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+def _require_own_job(job, current_user: User):
+    # Someone else's job is reported as missing, like an unknown id
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@router.post("/projects/{project_id}/jobs", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    project_id: int,
+    job: schemas.CreateJob,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    _require_project(db, project_id)
+    return runner.enqueue(db, job.kind, current_user.id, project_id, job.params)
+
+@router.post("/projects/{project_id}/jobs/upload", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_upload_job(
+    project_id: int,
+    file: UploadFile = File(...),
+    duplicates: Literal["flag", "skip", "link"] = Query(dedup.FLAG),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Same file formats as POST /projects/{id}/tasks/upload; the summary lands in the job's result
+    _require_project(db, project_id)
+    return runner.enqueue_upload(db, current_user.id, project_id, file.file, file.filename, duplicates)
+
+@router.get("/projects/{project_id}/jobs", response_model=list[schemas.JobOut])
+async def get_project_jobs(project_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Newest first; read from the primary, which the workers write to
+    return await db.run_sync(runner.get_project_jobs, project_id)
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    job = await db.run_sync(runner.get_job, job_id)
+    _require_own_job(job, current_user)
+    return job
+
+@router.get("/jobs/{job_id}/result", response_class=FileResponse)
+def get_job_result(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = runner.get_job(db, job_id)
+    _require_own_job(job, current_user)
+    if not job.result_path or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=404, detail="Job has no result file")
+    filename = f"project_{job.project_id}_{job.kind}{os.path.basename(job.result_path).removeprefix(job.id)}"
+    return FileResponse(job.result_path, filename=filename)
+
+@router.post("/jobs/{job_id}/cancel", response_model=schemas.JobOut)
+def cancel_job(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    _require_own_job(runner.get_job(db, job_id), current_user)
+    return runner.cancel(db, job_id)
@@ -0,0 +1,259 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from backend.database import SessionLocal
+from backend.jobs import models
+from backend.jobs.models import QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+
+logger = logging.getLogger("backend.jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Uploads are copied here before the request returns; exports are written here
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "ee_review_jobs"))
+# The worker publishes progress and polls for cancellation this often
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "2"))
+# A running job whose heartbeat is older than this at startup lost its worker
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+_executor = None
+_futures = {}  # job id -> Future, for jobs submitted by this process
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---- worker process side ----
+
+class JobContext:
+    # Handed to the handler. Only touches memory: the heartbeat thread does the I/O
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.done = 0
+        self.total = None
+        self.path = None
+        self.cancelled = threading.Event()
+
+    def progress(self, done: int, total: int | None = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+    def result_path(self, suffix: str) -> str:
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        self.path = os.path.join(JOBS_DIR, f"{self.job_id}{suffix}")
+        return self.path
+
+
+def _beat(ctx: JobContext):
+    try:
+        with SessionLocal() as db:
+            db.execute(
+                update(models.Job)
+                .where(models.Job.id == ctx.job_id)
+                .values(progress=ctx.done, total=ctx.total, heartbeat_at=datetime.utcnow())
+            )
+            cancel = db.query(models.Job.cancel_requested).filter(models.Job.id == ctx.job_id).scalar()
+            db.commit()
+    except SQLAlchemyError as e:
+        # e.g. SQLite busy while the handler holds the write lock; try next beat
+        logger.warning("heartbeat for job %s skipped: %s", ctx.job_id, getattr(e, "orig", None) or e)
+        return
+    if cancel:
+        ctx.cancelled.set()
+
+
+def _heartbeat(ctx: JobContext, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        _beat(ctx)
+
+
+def _finish(job_id: str, status: str, from_status=(RUNNING,), **values):
+    with SessionLocal() as db:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status.in_(from_status))
+            .values(status=status, finished_at=datetime.utcnow(), **values)
+        )
+        db.commit()
+
+
+def _remove(path: str | None):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def upload_path(job_id: str) -> str:
+    # Where an upload job's input copy lives; never taken from the job's params
+    return os.path.join(JOBS_DIR, f"{job_id}.upload")
+
+
+def _remove_upload(job: models.Job):
+    if job.kind != "upload":
+        return
+    path = os.path.realpath(upload_path(job.id))
+    if os.path.dirname(path) == os.path.realpath(JOBS_DIR):
+        _remove(path)
+
+
+def run(job_id: str):
+    # Worker entry point. Claiming is a conditional update, so a job submitted
+    # twice (e.g. by recover() in two server processes) still runs once
+    from backend.jobs.handlers import HANDLERS
+
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == QUEUED, models.Job.cancel_requested.is_(False))
+            .values(status=RUNNING, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+        job = db.get(models.Job, job_id)
+        ctx = JobContext(job_id)
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(ctx, stop), daemon=True)
+        beat.start()
+        try:
+            result = HANDLERS[job.kind](db, ctx, job)
+        except JobCancelled:
+            db.rollback()
+            _remove(ctx.path)
+            _finish(job_id, CANCELLED, progress=ctx.done, total=ctx.total)
+        except Exception as e:
+            db.rollback()
+            _remove(ctx.path)
+            logger.exception("job %s (%s) failed", job_id, job.kind)
+            _finish(job_id, FAILED, error=str(e) or type(e).__name__, progress=ctx.done, total=ctx.total)
+        else:
+            _finish(job_id, SUCCEEDED, result=result, result_path=ctx.path, progress=ctx.done, total=ctx.total)
+        finally:
+            stop.set()
+            beat.join()
+            _remove_upload(job)  # the job's input copy
+
+
+# ---- API process side ----
+
+def _get_executor():
+    global _executor
+    # A worker that died (e.g. OOM-killed) breaks the whole pool; start a new one
+    if _executor is None or getattr(_executor, "_broken", False):
+        # spawn, not fork: the server process is multi-threaded
+        _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _done(job_id: str, project_id: int | None, future):
+    _futures.pop(job_id, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        # run() handles handler errors itself, so this is a lost worker
+        _finish(job_id, FAILED, from_status=(QUEUED, RUNNING), error=f"worker lost: {error!r}")
+    # Caches live in the API process; the worker's invalidations don't reach them.
+    # Any kind may have written (uploads, rebuilds), even when it failed halfway
+    from backend.proj import crud
+    crud.invalidate_task_totals(project_id)
+    crud.invalidate_review_reports(project_id)
+
+
+def _submit(job_id: str, project_id: int | None):
+    future = _get_executor().submit(run, job_id)
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _done(job_id, project_id, f))
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def enqueue(
+    db: Session, kind: str, owner_id: int, project_id: int | None = None, params: dict | None = None,
+    job_id: str | None = None,
+) -> models.Job:
+    job = models.Job(
+        id=job_id or new_job_id(), kind=kind, owner_id=owner_id, project_id=project_id, params=params or {}
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _submit(job.id, project_id)
+    return job
+
+
+def enqueue_upload(
+    db: Session, owner_id: int, project_id: int, file, filename: str | None, duplicates: str = "flag"
+) -> models.Job:
+    # The request's spool is gone once it returns, so the job gets its own copy
+    job_id = new_job_id()
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(upload_path(job_id), "wb") as out:
+        shutil.copyfileobj(file, out, 1024 * 1024)
+    params = {"filename": filename, "duplicates": duplicates}
+    return enqueue(db, "upload", owner_id, project_id, params, job_id=job_id)
+
+
+def get_job(db: Session, job_id: str) -> models.Job | None:
+    return db.get(models.Job, job_id)
+
+
+def get_project_jobs(db: Session, project_id: int, limit: int = 50) -> list[models.Job]:
+    return (
+        db.query(models.Job)
+        .filter(models.Job.project_id == project_id)
+        .order_by(models.Job.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def cancel(db: Session, job_id: str) -> models.Job | None:
+    # Queued jobs are cancelled outright; a running one stops at its next
+    # progress call after the worker's heartbeat sees the flag
+    job = db.get(models.Job, job_id)
+    if job is None or job.status in models.FINISHED:
+        return job
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(cancel_requested=True))
+    db.commit()
+    future = _futures.get(job_id)
+    if future is not None:
+        future.cancel()
+    _finish(job_id, CANCELLED, from_status=(QUEUED,))
+    db.refresh(job)
+    if job.status == CANCELLED and job.started_at is None:
+        _remove_upload(job)  # never claimed, so run() won't clean up
+    return job
+
+
+def recover():
+    # At startup: fail jobs whose worker died with the previous server, and
+    # resubmit the ones that never started
+    stale = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    with SessionLocal() as db:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.status == RUNNING, models.Job.heartbeat_at < stale)
+            .values(status=FAILED, error="interrupted by a server restart", finished_at=datetime.utcnow())
+        )
+        db.commit()
+        queued = db.query(models.Job.id, models.Job.project_id).filter(models.Job.status == QUEUED).all()
+    for job_id, project_id in queued:
+        _submit(job_id, project_id)
@@ -0,0 +1,46 @@
+from pydantic import BaseModel, ValidationError, model_validator
+from typing import Literal
+from datetime import datetime
+
+# What each kind accepts in CreateJob.params; anything else is rejected
+class ExportParams(BaseModel):
+    gzip: bool = False
+
+    class Config:
+        extra = "forbid"
+
+class NoParams(BaseModel):
+    class Config:
+        extra = "forbid"
+
+JOB_PARAMS = {"export": ExportParams, "agreement": NoParams, "reindex": NoParams}
+
+class CreateJob(BaseModel):
+    kind: Literal["export", "agreement", "reindex"]
+    params: dict = {}  # e.g. {"gzip": true} for an export
+
+    @model_validator(mode="after")
+    def validate_params(self):
+        try:
+            self.params = JOB_PARAMS[self.kind].model_validate(self.params).model_dump()
+        except ValidationError as e:
+            raise ValueError(f"Invalid params for kind {self.kind!r}: {e.errors()[0]['msg']}")
+        return self
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    project_id: int | None = None
+    status: str  # queued, running, succeeded, failed or cancelled
+    progress: int
+    total: int | None = None
+    result: dict | None = None
+    has_file: bool = False  # GET /jobs/{id}/result serves the output
+    error: str | None = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
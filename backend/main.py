@@ -1,23 +1,42 @@
 # myapp/main.py
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from backend.static_files import PrecompressedStaticFiles
+from fastapi.responses import FileResponse, PlainTextResponse
 
 # from backend.auth import models, routes
 from backend.auth import routes as auth_routes, models as auth_models
 from backend.proj import routes as proj_routes, models as proj_models
-from backend.database import engine, Base
+from backend.proj import search, latest, stats
+from backend.jobs import routes as job_routes, runner as job_runner
+from backend.database import engine, async_engine, read_engine, async_read_engine, init_db, SessionLocal
+from backend import instrumentation
 
 import os
 
 # create database tables
-Base.metadata.create_all(bind=engine)
+init_db()
+search.ensure_search_index(engine)
+with SessionLocal() as db:
+    latest.backfill(db)
+    stats.backfill(db)
+# Fail jobs orphaned by a restart, resubmit queued ones
+job_runner.recover()
 
 app = FastAPI()
 
+# Per-request latency, SQL counts and pool wait, scraped from /api/v1/metrics
+if instrumentation.ENABLED:
+    instrumentation.instrument_engine(engine, "sync")
+    instrumentation.instrument_engine(async_engine.sync_engine, "async")
+    if read_engine is not engine:
+        instrumentation.instrument_engine(read_engine, "read")
+        instrumentation.instrument_engine(async_read_engine.sync_engine, "async_read")
+    app.add_middleware(instrumentation.InstrumentationMiddleware)
+
 # includ auth routes
 app.include_router(auth_routes.router, prefix="/api/v1", tags=["auth"])
 app.include_router(proj_routes.router, prefix="/api/v1", tags=["projects"])
+app.include_router(job_routes.router, prefix="/api/v1", tags=["jobs"])
 
 
 # Optional API route
@@ -25,6 +44,12 @@ app.include_router(proj_routes.router, prefix="/api/v1", tags=["projects"])
 def read_data():
     return {"msg": "Hello from backend!"}
 
+# Prometheus text format
+@app.get("/api/v1/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Serve static files
 frontend_dir = os.path.join(os.path.dirname(__file__), "static")
-app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="static")
+# Prebuilt .br/.gz variants per Accept-Encoding, immutable caching for hashed assets
+app.mount("/", PrecompressedStaticFiles(directory=frontend_dir, html=True), name="static")
@@ -0,0 +1,36 @@
+import gzip
+import os
+
+# Writes the compressed variants served by static_files.PrecompressedStaticFiles.
+# Standard library only (brotli optional): build_frontend.py runs this before
+# the backend's dependencies are installed.
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".ico", ".wasm"}
+MIN_SIZE = 1024  # below this the headers cost more than compression saves
+
+
+def precompress(directory: str) -> int:
+    # Writes .gz (and .br when brotli is installed) next to each compressible
+    # file, keeping a variant only when it is actually smaller
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE or os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(compressed)
+                    written += 1
+    return written
@@ -0,0 +1,340 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain, combinations
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from backend.cache import TTLCache
+from backend.proj import models, stats
+from backend.proj.events import parse_events, normalize_text
+import multiprocessing
+import os
+import re
+
+NONE = "NONE"  # label of an item a reviewer did not annotate
+
+AGREEMENT_WORKERS = int(os.getenv("AGREEMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+TASKS_PER_CHUNK = 250  # tasks handed to a worker process at a time
+MIN_PARALLEL_TASKS = 2 * TASKS_PER_CHUNK  # below this, pickling costs more than it saves
+
+FETCH_CHUNK_SIZE = 1000
+
+_TOKEN_RE = re.compile(r"\S+")
+
+# project_id -> (data version, report); see stats.data_version
+_reports_cache = TTLCache(maxsize=256, ttl=3600)
+_executor = None
+
+
+def invalidate_agreement(project_id: int | None = None):
+    if project_id is None:
+        _reports_cache.clear()
+    else:
+        _reports_cache.pop(project_id)
+
+
+# ---- per-task decisions (run inside worker processes) ----
+
+def _decisions(events: list[dict]):
+    # Event type per trigger, and role per (trigger, argument span)
+    types, roles = {}, {}
+    for event in events:
+        trigger = normalize_text(event["trigger"]["text"])
+        types.setdefault(trigger, event["event_type"] or NONE)
+        for arg in event["arguments"]:
+            roles.setdefault((trigger, normalize_text(arg["text"])), arg["role"])
+    return types, roles
+
+
+def _spans(article_lower: str, events: list[dict]) -> list[tuple[int, int]]:
+    # Character intervals of the argument spans, merged so overlap isn't double counted
+    intervals = []
+    for event in events:
+        for arg in event["arguments"]:
+            text = arg["text"].lower()
+            start = article_lower.find(text)
+            if start >= 0:
+                intervals.append((start, start + len(text)))
+    intervals.sort()
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _overlap(a: list[tuple[int, int]], b: list[tuple[int, int]]) -> int:
+    # Both interval lists are sorted and disjoint: a linear sweep finds every overlap
+    total = i = j = 0
+    while i < len(a) and j < len(b):
+        total += max(0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if a[i][1] <= b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def _to_tokens(spans, starts, ends):
+    # Map character intervals onto the token index range they touch
+    tokens = []
+    for start, end in spans:
+        first = bisect_right(ends, start)
+        last = bisect_left(starts, end)
+        if first < last:
+            if tokens and first <= tokens[-1][1]:
+                tokens[-1] = (tokens[-1][0], max(tokens[-1][1], last))
+            else:
+                tokens.append((first, last))
+    return tokens
+
+
+def _length(spans) -> int:
+    return sum(end - start for start, end in spans)
+
+
+def _new_partial():
+    return {
+        "tasks": 0,
+        "cohen": {"event_type": {}, "role": {}},
+        "fleiss": {
+            level: {"items": 0, "sum_p": 0.0, "ratings": Counter(), "binary": Counter()}
+            for level in ("event_type", "role")
+        },
+        "span": {unit: Counter() for unit in ("char", "token")},
+    }
+
+
+def _add_cohen(acc, pair, labels_a, labels_b):
+    stats = acc.setdefault(pair, {"n": 0, "diag": Counter(), "a": Counter(), "b": Counter()})
+    for item in labels_a.keys() | labels_b.keys():
+        la, lb = labels_a.get(item, NONE), labels_b.get(item, NONE)
+        stats["n"] += 1
+        stats["a"][la] += 1
+        stats["b"][lb] += 1
+        if la == lb:
+            stats["diag"][la] += 1
+
+
+def _add_fleiss(acc, labels_by_reviewer):
+    n = len(labels_by_reviewer)
+    if n < 2:
+        return
+    items = set().union(*(labels.keys() for labels in labels_by_reviewer))
+    for item in items:
+        counts = Counter(labels.get(item, NONE) for labels in labels_by_reviewer)
+        acc["items"] += 1
+        acc["sum_p"] += (sum(c * c for c in counts.values()) - n) / (n * (n - 1))
+        acc["ratings"].update(counts)
+        # Binary agreement on "category k or not"; items lacking k agree fully,
+        # so only the shortfall from 1 is stored
+        for category, c in counts.items():
+            acc["binary"][category] += (c * c + (n - c) * (n - c) - n) / (n * (n - 1)) - 1
+
+
+def score_chunk(chunk):
+    # `chunk` is a list of (article, [(reviewer_id, raw events JSON), ...]) per task
+    partial = _new_partial()
+    for article, reviews in chunk:
+        partial["tasks"] += 1
+        article_lower = article.lower()
+        tokens = [m.span() for m in _TOKEN_RE.finditer(article)]
+        token_starts = [start for start, _ in tokens]
+        token_ends = [end for _, end in tokens]
+
+        parsed = []
+        for reviewer_id, raw in reviews:
+            events = parse_events(raw)
+            types, roles = _decisions(events)
+            chars = _spans(article_lower, events)
+            parsed.append((reviewer_id, types, roles, chars, _to_tokens(chars, token_starts, token_ends)))
+        parsed.sort(key=lambda r: r[0])
+
+        _add_fleiss(partial["fleiss"]["event_type"], [p[1] for p in parsed])
+        _add_fleiss(partial["fleiss"]["role"], [p[2] for p in parsed])
+        for a, b in combinations(parsed, 2):
+            pair = (a[0], b[0])
+            _add_cohen(partial["cohen"]["event_type"], pair, a[1], b[1])
+            _add_cohen(partial["cohen"]["role"], pair, a[2], b[2])
+            for unit, ia, ib in (("char", a[3], b[3]), ("token", a[4], b[4])):
+                span = partial["span"][unit]
+                span["overlap"] += _overlap(ia, ib)
+                span["total"] += _length(ia) + _length(ib)
+                span["pairs"] += 1
+    return partial
+
+
+def _merge(into, partial):
+    into["tasks"] += partial["tasks"]
+    for level, pairs in partial["cohen"].items():
+        for pair, stats in pairs.items():
+            target = into["cohen"][level].setdefault(
+                pair, {"n": 0, "diag": Counter(), "a": Counter(), "b": Counter()}
+            )
+            target["n"] += stats["n"]
+            for key in ("diag", "a", "b"):
+                target[key].update(stats[key])
+    for level, stats in partial["fleiss"].items():
+        target = into["fleiss"][level]
+        target["items"] += stats["items"]
+        target["sum_p"] += stats["sum_p"]
+        target["ratings"].update(stats["ratings"])
+        # Counter.update keeps the negative shortfalls, unlike Counter addition
+        target["binary"].update(stats["binary"])
+    for unit, stats in partial["span"].items():
+        into["span"][unit].update(stats)
+    return into
+
+
+# ---- kappa from the accumulated counts ----
+
+def _kappa(observed: float, expected: float):
+    if expected >= 1.0:
+        return 1.0 if observed >= 1.0 else None
+    return (observed - expected) / (1.0 - expected)
+
+
+def _cohen(stats):
+    n = stats["n"]
+    observed = sum(stats["diag"].values()) / n
+    expected = sum(stats["a"][k] * stats["b"][k] for k in stats["a"]) / (n * n)
+    per_category = {}
+    for k in (stats["a"].keys() | stats["b"].keys()) - {NONE}:
+        a, b, both = stats["a"][k], stats["b"][k], stats["diag"][k]
+        agree = (n - a - b + 2 * both) / n
+        chance = (a * b + (n - a) * (n - b)) / (n * n)
+        per_category[k] = _kappa(agree, chance)
+    return _kappa(observed, expected), per_category
+
+
+def _fleiss(stats):
+    items = stats["items"]
+    if not items:
+        return None, {}
+    total = sum(stats["ratings"].values())
+    expected = sum((c / total) ** 2 for c in stats["ratings"].values())
+    per_category = {}
+    for k, c in stats["ratings"].items():
+        if k == NONE:
+            continue
+        p = c / total
+        per_category[k] = _kappa((items + stats["binary"][k]) / items, p * p + (1 - p) * (1 - p))
+    return _kappa(stats["sum_p"] / items, expected), per_category
+
+
+def _report(acc) -> dict:
+    report = {"tasks": acc["tasks"]}
+    for level, key in (("event_type", "per_type"), ("role", "per_role")):
+        pairs = []
+        for (a, b), stats in sorted(acc["cohen"][level].items()):
+            if not stats["n"]:
+                continue
+            kappa, per_category = _cohen(stats)
+            pairs.append({
+                "reviewer_a": a,
+                "reviewer_b": b,
+                "items": stats["n"],
+                "kappa": kappa,
+                key: per_category,
+            })
+        fleiss, per_category = _fleiss(acc["fleiss"][level])
+        report[level] = {
+            "cohen": pairs,
+            "fleiss": {"items": acc["fleiss"][level]["items"], "kappa": fleiss, key: per_category},
+        }
+
+    report["span"] = {}
+    for unit, stats in acc["span"].items():
+        overlap, total = stats["overlap"], stats["total"]
+        report["span"][unit] = {
+            "pairs": stats["pairs"],
+            "dice": 2 * overlap / total if total else None,
+            "jaccard": overlap / (total - overlap) if total - overlap else None,
+        }
+    return report
+
+
+# ---- loading and partitioning ----
+
+def _iter_tasks(db: Session, project_id: int):
+    # (article, latest review per reviewer) for each task with at least two reviewers
+    query = (
+        select(models.Task.id, models.Task.article, models.Review.reviewer_id, models.Review.events)
+        .join(models.LatestReview, models.LatestReview.task_id == models.Task.id)
+        .join(models.Review, models.Review.id == models.LatestReview.review_id)
+        .where(models.LatestReview.project_id == project_id)
+        .order_by(models.Task.id, models.Review.reviewer_id)
+        .execution_options(yield_per=FETCH_CHUNK_SIZE)
+    )
+    current, article, reviews = None, None, {}
+    for task_id, task_article, reviewer_id, events in db.execute(query):
+        if task_id != current:
+            if len(reviews) > 1:
+                yield article, list(reviews.items())
+            current, article, reviews = task_id, task_article, {}
+        reviews.setdefault(reviewer_id, events)
+    if len(reviews) > 1:
+        yield article, list(reviews.items())
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _get_executor(workers: int):
+    global _executor
+    if _executor is None or _executor._max_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        # spawn, not fork: the server process is multi-threaded
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def compute_agreement(db: Session, project_id: int, workers: int = AGREEMENT_WORKERS) -> dict:
+    result = _new_partial()
+    chunks = _chunks(_iter_tasks(db, project_id), TASKS_PER_CHUNK)
+
+    # Score in-process until there is enough work to be worth fanning out
+    buffered = []
+    for chunk in chunks:
+        buffered.append(chunk)
+        if len(buffered) * TASKS_PER_CHUNK >= MIN_PARALLEL_TASKS:
+            break
+    if workers <= 1 or len(buffered) * TASKS_PER_CHUNK < MIN_PARALLEL_TASKS:
+        for chunk in buffered + list(chunks):
+            _merge(result, score_chunk(chunk))
+        return _report(result)
+
+    # Keep a bounded number of chunks in flight so memory stays flat
+    executor = _get_executor(workers)
+    pending = set()
+    for chunk in chain(buffered, chunks):
+        pending.add(executor.submit(score_chunk, chunk))
+        if len(pending) >= 2 * workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                _merge(result, future.result())
+    for future in pending:
+        _merge(result, future.result())
+    return _report(result)
+
+
+def get_agreement(db: Session, project_id: int) -> dict:
+    version = stats.data_version(db, project_id)
+    cached = _reports_cache.get(project_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    report = compute_agreement(db, project_id)
+    if version is not None:
+        _reports_cache.set(project_id, (version, report))
+    return report
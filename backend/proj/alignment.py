@@ -0,0 +1,107 @@
+import bisect
+
+# Resolves the trigger and argument strings of imported LLM events to character
+# offsets into the article, so a task renders without searching the text again.
+# Each span gets "start"/"end" (end exclusive), or "unmatched": true when its
+# text doesn't occur in the article at all - most likely a hallucinated span.
+# The event store aligns its parsed copy of the events; Task.events keeps the
+# uploaded JSON as it was.
+#
+# Occurrences are found with one str.find scan per distinct span string: in
+# CPython that is about ten times faster than a pure-Python Aho-Corasick
+# automaton over article-sized texts, and the event lists are small.
+
+def _fold(text: str) -> str:
+    # Lowercased without changing the length, so folded offsets are article offsets
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _occurrences(folded: str, patterns: set[str]) -> dict[str, list[int]]:
+    found = {}
+    for pattern in patterns:
+        starts = []
+        i = folded.find(pattern)
+        while i != -1:
+            starts.append(i)
+            i = folded.find(pattern, i + 1)
+        found[pattern] = starts
+    return found
+
+
+def _span(item) -> dict | None:
+    # Spans are {"text": ...}; bare strings are promoted so offsets have a place to go
+    if isinstance(item, str):
+        return {"text": item}
+    return item if isinstance(item, dict) else None
+
+
+def _valid(article: str, span: dict) -> bool:
+    # Case-insensitive, like the search, so offsets found earlier stay valid
+    start, end = span.get("start"), span.get("end")
+    return (
+        isinstance(start, int) and isinstance(end, int) and 0 <= start < end <= len(article)
+        and _fold(article[start:end]) == _fold(span["text"].strip())
+    )
+
+
+def _place(span: dict, key: str, starts: list[int], near: int | None = None, nth: int = 0) -> int | None:
+    # `key` is the folded span text, as long as the stripped text
+    span.pop("unmatched", None)
+    if not starts:
+        span.pop("start", None)
+        span.pop("end", None)
+        span["unmatched"] = True
+        return None
+    if near is None:
+        start = starts[min(nth, len(starts) - 1)]
+    else:
+        # The occurrence closest to the event's trigger
+        i = bisect.bisect_left(starts, near)
+        start = starts[i] if i < len(starts) else starts[-1]
+        if i and near - starts[i - 1] <= abs(start - near):
+            start = starts[i - 1]
+    span["start"], span["end"] = start, start + len(key)
+    return start
+
+
+def align_events(article: str, events: list) -> int:
+    # Adds offsets to the events in place; returns the number of unmatched spans.
+    # Offsets already present are kept when they point at the span's text.
+    spans = []  # (event index, span, is trigger)
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            continue
+        trigger = _span(event.get("trigger"))
+        if trigger is not None:
+            event["trigger"] = trigger
+            spans.append((index, trigger, True))
+        for arg in event.get("arguments") or []:
+            if isinstance(arg, dict):
+                spans.append((index, arg, False))
+
+    pending = {}  # id(span) -> folded text, for the spans to place
+    for _, span, _ in spans:
+        text = span.get("text")
+        if isinstance(text, str) and text.strip() and ("start" not in span or not _valid(article, span)):
+            pending[id(span)] = _fold(text.strip())
+    if pending:
+        found = _occurrences(_fold(article), set(pending.values()))
+        # Triggers first: the k-th event with a given trigger text takes its k-th occurrence
+        anchors, seen = {}, {}
+        for index, span, is_trigger in spans:
+            if not is_trigger:
+                continue
+            key = pending.get(id(span))
+            if key is None:
+                anchors[index] = span.get("start")
+                continue
+            anchors[index] = _place(span, key, found[key], nth=seen.get(key, 0))
+            seen[key] = seen.get(key, 0) + 1
+        for index, span, is_trigger in spans:
+            key = None if is_trigger else pending.get(id(span))
+            if key is not None:
+                _place(span, key, found[key], near=anchors.get(index))
+    return sum(1 for _, span, _ in spans if span.get("unmatched"))
@@ -0,0 +1,174 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.proj import models
+from backend.proj.consensus import MIN_AGREEMENT
+import os
+
+# Annotators each task should get (guidelines §5: 3 to 5); stored per task when queued
+ANNOTATORS_PER_TASK = int(os.getenv("ANNOTATORS_PER_TASK", str(MIN_AGREEMENT)))
+# How long a reviewer holds a task they were handed before the slot is freed again
+LEASE_SECONDS = int(os.getenv("ASSIGNMENT_LEASE_SECONDS", "1800"))
+
+
+def _has_reviewed(db: Session, task_id: str, reviewer_id: int, exclude_review_id: int | None = None) -> bool:
+    criteria = [models.Review.task_id == task_id, models.Review.reviewer_id == reviewer_id]
+    if exclude_review_id is not None:
+        criteria.append(models.Review.id != exclude_review_id)
+    return db.query(exists().where(*criteria)).scalar()
+
+
+def _shift(db: Session, task_id: str, delta: int):
+    db.execute(
+        update(models.TaskQueue)
+        .where(models.TaskQueue.task_id == task_id, models.TaskQueue.assigned + delta >= 0)
+        .values(assigned=models.TaskQueue.assigned + delta)
+    )
+
+
+def enqueue_tasks(db: Session, tasks: list[dict]):
+    # `tasks` are rows with id/project_id; re-uploaded tasks keep their counts. Callers commit.
+    if not tasks:
+        return
+    rows = [{"task_id": t["id"], "project_id": t["project_id"], "assigned": 0, "quota": ANNOTATORS_PER_TASK} for t in tasks]
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            entry = db.get(models.TaskQueue, row["task_id"])
+            if entry is None:
+                db.add(models.TaskQueue(**row))
+            else:
+                entry.project_id = row["project_id"]
+        return
+
+    insert = sqlite_insert if dialect == "sqlite" else pg_insert
+    stmt = insert(models.TaskQueue.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.TaskQueue.task_id],
+        set_={"project_id": stmt.excluded.project_id},
+    )
+    db.execute(stmt, rows)
+
+
+def review_added(db: Session, task_id: str, reviewer_id: int, review_id: int):
+    # The reviewer's lease, if any, turns into a finished review and keeps its slot.
+    # A re-review by the same reviewer takes no new slot.
+    released = db.execute(
+        delete(models.TaskLease).where(
+            models.TaskLease.task_id == task_id, models.TaskLease.reviewer_id == reviewer_id
+        )
+    ).rowcount
+    if not released and not _has_reviewed(db, task_id, reviewer_id, exclude_review_id=review_id):
+        _shift(db, task_id, 1)
+
+
+def review_removed(db: Session, task_id: str, reviewer_id: int):
+    # Called after the review is deleted: the slot frees up with the reviewer's last review
+    if not _has_reviewed(db, task_id, reviewer_id):
+        _shift(db, task_id, -1)
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    db.query(models.TaskLease).filter(models.TaskLease.task_id.in_(task_ids)).delete(synchronize_session=False)
+    db.query(models.TaskQueue).filter(models.TaskQueue.task_id.in_(task_ids)).delete(synchronize_session=False)
+
+
+def delete_project(db: Session, project_id: int):
+    db.query(models.TaskLease).filter(models.TaskLease.project_id == project_id).delete(synchronize_session=False)
+    db.query(models.TaskQueue).filter(models.TaskQueue.project_id == project_id).delete(synchronize_session=False)
+
+
+def _expire_leases(db: Session, project_id: int, now: datetime):
+    criteria = (models.TaskLease.project_id == project_id, models.TaskLease.expires_at <= now)
+    expired = delete(models.TaskLease).where(*criteria)
+    if db.get_bind().dialect.delete_returning:
+        # Only the leases this transaction actually removed give their slot back,
+        # so concurrent sweeps can't free the same slot twice
+        task_ids = db.execute(expired.returning(models.TaskLease.task_id)).scalars().all()
+    else:
+        task_ids = db.execute(select(models.TaskLease.task_id).where(*criteria)).scalars().all()
+        db.execute(expired)
+    for task_id, count in Counter(task_ids).items():
+        _shift(db, task_id, -count)
+
+
+def claim_next(db: Session, project_id: int, reviewer_id: int):
+    # Returns (task, lease, queue entry) for the reviewer, or None when every task
+    # they could take is at quota. A reviewer holding an unexpired lease gets the same task back.
+    now = datetime.utcnow()
+    _expire_leases(db, project_id, now)
+
+    lease = (
+        db.query(models.TaskLease)
+        .filter(models.TaskLease.project_id == project_id, models.TaskLease.reviewer_id == reviewer_id)
+        .first()
+    )
+    if lease is None:
+        entry = db.execute(
+            select(models.TaskQueue)
+            .where(
+                models.TaskQueue.project_id == project_id,
+                models.TaskQueue.assigned < models.TaskQueue.quota,
+                ~exists().where(
+                    models.Review.task_id == models.TaskQueue.task_id,
+                    models.Review.reviewer_id == reviewer_id,
+                ),
+            )
+            .order_by(models.TaskQueue.assigned, models.TaskQueue.task_id)
+            .limit(1)
+            # Concurrent claims on Postgres move on to the next row instead of waiting
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if entry is None:
+            db.commit()
+            return None
+        lease = models.TaskLease(
+            task_id=entry.task_id,
+            project_id=project_id,
+            reviewer_id=reviewer_id,
+            expires_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+        db.add(lease)
+        _shift(db, entry.task_id, 1)
+    db.commit()
+
+    task = db.get(models.Task, lease.task_id)
+    entry = db.get(models.TaskQueue, lease.task_id)
+    db.refresh(entry)
+    return task, lease, entry
+
+
+def rebuild_queue(db: Session, project_id: int) -> int:
+    # Recounts slots from reviews and open leases, e.g. for tasks created before the queue existed
+    db.query(models.TaskQueue).filter(models.TaskQueue.project_id == project_id).delete(synchronize_session=False)
+    db.query(models.TaskLease).filter(
+        models.TaskLease.project_id == project_id, models.TaskLease.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+    reviewers = dict(
+        db.query(models.Review.task_id, func.count(func.distinct(models.Review.reviewer_id)))
+        .join(models.Task, models.Task.id == models.Review.task_id)
+        .filter(models.Task.project_id == project_id)
+        .group_by(models.Review.task_id)
+    )
+    leases = dict(
+        db.query(models.TaskLease.task_id, func.count())
+        .filter(models.TaskLease.project_id == project_id)
+        .group_by(models.TaskLease.task_id)
+    )
+    rows = [
+        {
+            "task_id": task_id,
+            "project_id": project_id,
+            "assigned": reviewers.get(task_id, 0) + leases.get(task_id, 0),
+            "quota": ANNOTATORS_PER_TASK,
+        }
+        for (task_id,) in db.query(models.Task.id).filter(models.Task.project_id == project_id)
+    ]
+    if rows:
+        db.execute(models.TaskQueue.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
@@ -0,0 +1,281 @@
+import os
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from backend.database import ReadSessionLocal
+from backend.proj import models
+from backend.proj.event_store import SOURCE_REVIEW, SOURCE_TASK
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only the JSONL export is available
+    pa = pq = None
+
+# Flat, typed copies of a project for training and analytics: one table per
+# export, streamed out a row group at a time. Events come from the event store
+# (the LLM output plus every reviewer's latest review), so nothing is re-parsed
+# from the task JSON. An export with `since` holds the current rows of every task
+# and review modified from then on; consumers replace by task_id (and reviewer_id).
+
+ROW_GROUP_SIZE = int(os.getenv("COLUMNAR_ROW_GROUP_SIZE", "50000"))
+FETCH_CHUNK_SIZE = 2000  # rows fetched per round trip
+
+FORMATS = {
+    # format -> (media type, file extension)
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),  # IPC file, memory-mappable
+}
+
+COLUMNS = {
+    "tasks": {
+        "task_id": "string",
+        "article": "string",
+        "created_at": "timestamp",
+        "modified_at": "timestamp",
+    },
+    "events": {
+        "task_id": "string",
+        "source": "string",
+        "review_id": "int64",
+        "reviewer_id": "int64",
+        "position": "int32",
+        "event_type": "string",
+        "trigger": "string",
+        "trigger_start": "int32",
+        "trigger_end": "int32",
+        "arguments": "int32",
+    },
+    "arguments": {
+        "task_id": "string",
+        "source": "string",
+        "review_id": "int64",
+        "reviewer_id": "int64",
+        "event_position": "int32",
+        "position": "int32",
+        "event_type": "string",
+        "role": "string",
+        "text": "string",
+        "start": "int32",
+        "end": "int32",
+        "incorrect": "bool",
+        "correction": "string",
+    },
+    "reviews": {
+        "task_id": "string",
+        "review_id": "int64",
+        "reviewer_id": "int64",
+        "comment": "string",
+        "created_at": "timestamp",
+        "modified_at": "timestamp",
+    },
+}
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def schema(table: str, columns: list[str] | None = None):
+    # Raises ValueError for columns the table doesn't have
+    fields = COLUMNS[table]
+    columns = columns or list(fields)
+    unknown = [column for column in columns if column not in fields]
+    if unknown:
+        raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+    types = {
+        "string": pa.string(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(column, types[fields[column]]) for column in columns])
+
+
+def _naive_utc(since: datetime | None) -> datetime | None:
+    # Timestamps are stored as naive UTC
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def _count(raw) -> int:
+    return len(raw) if isinstance(raw, list) else 0
+
+
+# ---- row sources, in task id order ----
+
+def _task_rows(db: Session, project_id: int, columns: list[str], since):
+    # Only the projected columns are read; the article is most of a task's bytes
+    wanted = {
+        "task_id": models.Task.id,
+        "article": models.Task.article,
+        "created_at": models.Task.created_at,
+        "modified_at": models.Task.modified_at,
+    }
+    selected = [wanted["task_id"]] + [wanted[c] for c in columns if c != "task_id"]
+    query = select(*selected).where(models.Task.project_id == project_id).order_by(models.Task.id)
+    if since is not None:
+        query = query.where(models.Task.modified_at >= since)
+    names = ["task_id"] + [c for c in columns if c != "task_id"]
+    for row in db.execute(query.execution_options(yield_per=FETCH_CHUNK_SIZE)):
+        yield dict(zip(names, row))
+
+
+def _event_query(project_id: int, since, with_data: bool):
+    event = models.Event
+    selected = [
+        event.task_id, event.review_id, event.reviewer_id, event.position,
+        event.event_type, event.trigger, event.trigger_start, event.trigger_end, event.data,
+    ]
+    if not with_data:
+        selected.pop()
+    query = (
+        select(*selected)
+        .where(event.project_id == project_id)
+        .order_by(event.task_id, event.review_id.nulls_first(), event.position)
+    )
+    if since is not None:
+        query = (
+            query.join(models.Task, models.Task.id == event.task_id)
+            .outerjoin(models.Review, models.Review.id == event.review_id)
+            .where(or_(
+                and_(event.review_id.is_(None), models.Task.modified_at >= since),
+                models.Review.modified_at >= since,
+            ))
+        )
+    return query.execution_options(yield_per=FETCH_CHUNK_SIZE)
+
+
+def _event_rows(db: Session, project_id: int, columns: list[str], since):
+    with_data = "arguments" in columns
+    for row in db.execute(_event_query(project_id, since, with_data)):
+        yield {
+            "task_id": row.task_id,
+            "source": SOURCE_TASK if row.review_id is None else SOURCE_REVIEW,
+            "review_id": row.review_id,
+            "reviewer_id": row.reviewer_id,
+            "position": row.position,
+            "event_type": row.event_type,
+            "trigger": row.trigger,
+            "trigger_start": row.trigger_start,
+            "trigger_end": row.trigger_end,
+            "arguments": _count((row.data or {}).get("arguments")) if with_data else None,
+        }
+
+
+def _argument_rows(db: Session, project_id: int, columns: list[str], since):
+    # From the stored event rather than event_arguments, which keeps no
+    # position or reviewer decision (incorrect/correction)
+    for row in db.execute(_event_query(project_id, since, with_data=True)):
+        source = SOURCE_TASK if row.review_id is None else SOURCE_REVIEW
+        for position, arg in enumerate((row.data or {}).get("arguments") or []):
+            yield {
+                "task_id": row.task_id,
+                "source": source,
+                "review_id": row.review_id,
+                "reviewer_id": row.reviewer_id,
+                "event_position": row.position,
+                "position": position,
+                "event_type": row.event_type,
+                "role": arg.get("role"),
+                # Stored events carry a correction as the text, with the span it replaced as "original"
+                "text": arg.get("original") or arg.get("text"),
+                "start": arg.get("start"),
+                "end": arg.get("end"),
+                "incorrect": "original" in arg,
+                "correction": arg.get("text") if "original" in arg else None,
+            }
+
+
+def _review_rows(db: Session, project_id: int, columns: list[str], since):
+    # Each reviewer's current review, i.e. the decisions the review events come from
+    review = models.Review
+    query = (
+        select(review.task_id, review.id, review.reviewer_id, review.comment, review.created_at, review.modified_at)
+        .join(models.LatestReview, models.LatestReview.review_id == review.id)
+        .where(models.LatestReview.project_id == project_id)
+        .order_by(models.LatestReview.task_id, models.LatestReview.reviewer_id)
+    )
+    if since is not None:
+        query = query.where(review.modified_at >= since)
+    for task_id, review_id, reviewer_id, comment, created_at, modified_at in db.execute(
+        query.execution_options(yield_per=FETCH_CHUNK_SIZE)
+    ):
+        yield {
+            "task_id": task_id,
+            "review_id": review_id,
+            "reviewer_id": reviewer_id,
+            "comment": comment,
+            "created_at": created_at,
+            "modified_at": modified_at,
+        }
+
+
+ROWS = {"tasks": _task_rows, "events": _event_rows, "arguments": _argument_rows, "reviews": _review_rows}
+
+
+# ---- writers ----
+
+class _Sink:
+    # Write-only file object drained after every row group, so the response
+    # never holds more than one encoded group
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _batches(rows, arrow_schema):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROW_GROUP_SIZE:
+            yield pa.RecordBatch.from_pylist(batch, schema=arrow_schema)
+            batch = []
+    if batch:
+        yield pa.RecordBatch.from_pylist(batch, schema=arrow_schema)
+
+
+def stream_export(project_id: int, table: str, fmt: str = "parquet", columns: list[str] | None = None, since=None):
+    # Validate with schema() first: errors raised here surface after the response started.
+    # Owns its session, like crud.stream_export_jsonl
+    arrow_schema = schema(table, columns)
+    since = _naive_utc(since)
+    db = ReadSessionLocal()
+    try:
+        sink = _Sink()
+        out = pa.PythonFile(sink, mode="w")
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(out, arrow_schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(out, arrow_schema)
+        # An empty export is still a valid file with the schema
+        for batch in _batches(ROWS[table](db, project_id, arrow_schema.names, since), arrow_schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy.orm import Session
+from backend.proj import models
+from backend.proj.events import parse_events, normalize_text
+import json
+import os
+
+# Votes an item needs to become ground truth (guidelines §5: 3 of 3-5 annotators)
+MIN_AGREEMENT = int(os.getenv("CONSENSUS_MIN_AGREEMENT", "3"))
+
+STATUS_PENDING = "pending"  # fewer reviewers than MIN_AGREEMENT so far
+STATUS_AGREED = "agreed"  # every item reached a majority
+STATUS_ADJUDICATION = "adjudication"  # at least one item needs an expert
+
+
+def _majority(votes: Counter, min_agreement: int):
+    value, count = votes.most_common(1)[0]
+    return value if count >= min_agreement else None
+
+
+def vote(review_events: list[list[dict]], min_agreement: int = MIN_AGREEMENT):
+    # `review_events` holds one parsed event list per reviewer (their latest review).
+    # Triggers are aligned on normalized text; the type and each (role, text)
+    # argument of an accepted trigger are then voted on among the reviewers who
+    # kept it, so a role can hold several agreed arguments (e.g. two places).
+    reviewers = len(review_events)
+    if reviewers < min_agreement:
+        return STATUS_PENDING, [], []
+
+    display = {}  # normalized span -> first spelling seen
+    trigger_votes = Counter()
+    type_votes = {}
+    argument_votes = {}
+    for events in review_events:
+        seen = set()
+        for event in events:
+            key = normalize_text(event["trigger"]["text"])
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            display.setdefault(key, event["trigger"]["text"])
+            trigger_votes[key] += 1
+            type_votes.setdefault(key, Counter())[event["event_type"]] += 1
+            filled = set()
+            for arg in event["arguments"]:
+                text = normalize_text(arg["text"])
+                filled.add((arg["role"], text))
+                display.setdefault(text, arg["text"])
+            argument_votes.setdefault(key, Counter()).update(filled)
+
+    agreed, disputes = [], []
+    for key, present in trigger_votes.items():
+        if present < min_agreement:
+            # Rejected outright when enough reviewers left it out, disputed otherwise
+            if reviewers - present < min_agreement:
+                disputes.append({
+                    "kind": "trigger",
+                    "trigger": display[key],
+                    "votes": {"present": present, "absent": reviewers - present},
+                })
+            continue
+
+        event_type = _majority(type_votes[key], min_agreement)
+        if event_type is None:
+            disputes.append({
+                "kind": "event_type",
+                "trigger": display[key],
+                "votes": dict(type_votes[key]),
+            })
+            continue
+
+        arguments = []
+        for (role, text), count in argument_votes.get(key, Counter()).items():
+            # Reviewers who kept the trigger but not this argument vote against it
+            if count >= min_agreement:
+                arguments.append({"role": role, "text": display[text]})
+            elif present - count < min_agreement:
+                disputes.append({
+                    "kind": "argument",
+                    "trigger": display[key],
+                    "role": role,
+                    "votes": {display[text]: count, "": present - count},
+                })
+        agreed.append({
+            "event_type": event_type,
+            "trigger": {"text": display[key]},
+            "arguments": arguments,
+        })
+
+    return (STATUS_ADJUDICATION if disputes else STATUS_AGREED), agreed, disputes
+
+
+def latest_review_events(db: Session, task_id: str) -> list[list[dict]]:
+    reviews = (
+        db.query(models.Review.events)
+        .join(models.LatestReview, models.LatestReview.review_id == models.Review.id)
+        .filter(models.LatestReview.task_id == task_id)
+        .order_by(models.LatestReview.reviewer_id)
+    )
+    return [parse_events(events) for (events,) in reviews]
+
+
+def update_task_consensus(db: Session, task_id: str, project_id: int):
+    # Re-votes a single task; callers commit. This is what keeps ground truth
+    # current on every review write without rescanning the project.
+    review_events = latest_review_events(db, task_id)
+    status, events, disputes = vote(review_events)
+
+    row = db.get(models.Consensus, task_id)
+    if row is None:
+        row = models.Consensus(task_id=task_id)
+        db.add(row)
+    row.project_id = project_id
+    row.status = status
+    row.num_reviews = len(review_events)
+    row.events = json.dumps(events, ensure_ascii=False)
+    row.disputes = json.dumps(disputes, ensure_ascii=False)
+    row.updated_at = datetime.utcnow()
+    return row
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    db.query(models.Consensus).filter(models.Consensus.task_id.in_(task_ids)).delete(synchronize_session=False)
+
+
+def delete_project(db: Session, project_id: int):
+    db.query(models.Consensus).filter(models.Consensus.project_id == project_id).delete(synchronize_session=False)
+
+
+def rebuild_project_consensus(db: Session, project_id: int) -> int:
+    # One-off backfill for reviews written before consensus was tracked
+    task_ids = (
+        db.query(models.LatestReview.task_id)
+        .filter(models.LatestReview.project_id == project_id)
+        .distinct()
+    )
+    count = 0
+    for (task_id,) in task_ids.all():
+        update_task_consensus(db, task_id, project_id)
+        count += 1
+    db.commit()
+    return count
+
+
+def get_consensus(db: Session, task_id: str):
+    return db.get(models.Consensus, task_id)
+
+
+def get_project_consensus(
+    db: Session,
+    project_id: int,
+    status: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    query = db.query(models.Consensus).filter(models.Consensus.project_id == project_id)
+    if status is not None:
+        query = query.filter(models.Consensus.status == status)
+    return query.order_by(models.Consensus.updated_at).offset(skip).limit(limit).all()
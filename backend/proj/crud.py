@@ -1,13 +1,23 @@
-from sqlalchemy.orm import Session
-from backend.proj import models, schemas
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session, defer
+from backend.proj import models, schemas, consensus, evaluation, agreement, diffs, event_store, search, assignment, stats, idempotency, latest, dedup
+from backend.proj.events import parse_events
+from backend.database import ReadSessionLocal
+from backend.cache import TTLCache
 from sqlalchemy.sql import exists
-from sqlalchemy import func
-from collections import defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from collections import Counter
+from datetime import datetime
+from io import BytesIO
+import codecs
 import csv
+import hashlib
+import itertools
 import json
 import os
-from io import StringIO
+import zlib
 
 
 # project CRUD operations
@@ -20,6 +30,8 @@ def get_projects(db: Session, owner_id: int, skip: int = 0, limit: int = 100):
 def create_project(db: Session, project: schemas.CreateProject, owner_id: int):
     db_project = models.Project(**project.dict(), owner_id=owner_id)
     db.add(db_project)
+    db.flush()
+    stats.project_created(db, db_project.id)
     db.commit()
     db.refresh(db_project)
     return db_project
@@ -38,14 +50,106 @@ def delete_project(db: Session, project_id: int):
     db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if db_project:
         db.delete(db_project)
+        event_store.delete_project_events(db, project_id)
+        search.delete_project(db, project_id)
+        assignment.delete_project(db, project_id)
+        stats.delete_project(db, project_id)
+        latest.delete_project(db, project_id)
+        dedup.delete_project(db, project_id)
+        consensus.delete_project(db, project_id)
+        diffs.delete_project(db, project_id)
         db.commit()
+        invalidate_task_totals(project_id)
+        invalidate_review_reports(project_id)
         return db_project
     return None
 
 # task CRUD operations
+def _task_index_row(task: models.Task) -> dict:
+    return {"id": task.id, "project_id": task.project_id, "article": task.article, "events": task.events}
+
+def _index_tasks(db: Session, rows: list[dict]):
+    # Derived per-task indexes, written in the same transaction as the tasks;
+    # the events are parsed once for all of them
+    rows = [dict(row, parsed=parse_events(row["events"])) for row in rows]
+    event_store.index_tasks(db, rows)
+    search.index_tasks(db, rows)
+    assignment.enqueue_tasks(db, rows)
+
+def _index_review(db: Session, db_task: models.Task, reviewer_id: int):
+    event_store.index_reviewer(db, db_task.id, reviewer_id, db_task.project_id)
+    search.index_task(db, db_task)  # picks up the reviewer's spans from the event tables
+
 def get_task(db: Session, task_id: str):
     return db.query(models.Task).filter(models.Task.id == task_id).first()
 
+
+def get_task_detail(db: Session, task_id: str):
+    task = get_task(db, task_id)
+    if task:
+        task.spans = event_store.task_spans(db, task)  # transient, not a column
+    return task
+
+# Per-project task totals, keyed by (reviewer or None, status filter). Stored
+# with the project's data version: another worker's write bumps the version in
+# the database, which retires these entries here too. Local writes also drop them.
+_task_totals = TTLCache(maxsize=1024, ttl=300)
+
+
+def invalidate_task_totals(project_id: int | None = None):
+    if project_id is None:
+        _task_totals.clear()
+    else:
+        _task_totals.pop(project_id)
+
+
+def _reviewed_by(user_id: int):
+    # A primary-key probe on the latest-review pointers
+    return exists().where(
+        models.LatestReview.task_id == models.Task.id,
+        models.LatestReview.reviewer_id == user_id,
+    )
+
+
+def count_tasks(db: Session, user_id: int, project_id: int, status: bool | None = None) -> int:
+    version = stats.data_version(db, project_id)
+    cached = _task_totals.get(project_id)
+    if cached is not None and cached[0] == version:
+        totals = cached[1]
+    else:
+        totals = {}
+        if version is not None:
+            _task_totals.set(project_id, (version, totals))
+    key = (None if status is None else user_id, status)
+    if key not in totals:
+        query = db.query(func.count(models.Task.id)).filter(models.Task.project_id == project_id)
+        if status is not None:
+            reviewed = _reviewed_by(user_id)
+            query = query.filter(reviewed if status else ~reviewed)
+        totals[key] = query.scalar()
+    return totals[key]
+
+
+SNIPPET_CHARS = 200  # article characters in a summary listing
+
+
+def _snippet(text: str | None) -> str | None:
+    # Cut at a word boundary; `text` is SNIPPET_CHARS + 1 characters when the article is longer
+    if text is None or len(text) <= SNIPPET_CHARS:
+        return text
+    cut = text[:SNIPPET_CHARS]
+    return (cut.rsplit(None, 1)[0] if " " in cut else cut) + "..."
+
+
+def _event_count():
+    # The LLM output's rows in the event store, counted off ix_events_task_id_reviewer_id
+    return (
+        select(func.count(models.Event.id))
+        .where(models.Event.task_id == models.Task.id, models.Event.reviewer_id.is_(None))
+        .scalar_subquery()
+    )
+
+
 def get_tasks_with_total(
     db: Session,
     user_id: int,
@@ -53,44 +157,48 @@ def get_tasks_with_total(
     skip: int = 0,
     limit: int = 100,
     status: bool | None = None,
+    after: str | None = None,
+    summary: bool = False,
 ):
-    from sqlalchemy.sql import exists
-
-    # Base query
-    base_query = db.query(models.Task).filter(models.Task.project_id == project_id)
-
-    # Subquery to check if review exists for task by this user
-    review_exists_subq = (
-        db.query(models.Review)
-        .filter(
-            models.Review.reviewer_id == user_id,
-            models.Review.task_id == models.Task.id,
-        )
+    reviewed = _reviewed_by(user_id)
+
+    # `status` is resolved per row by an index-backed semi-join, only for this page
+    columns = [reviewed.label("status")]
+    if summary:
+        # Article and events are deferred: only the snippet and the event count
+        # leave the database. raiseload turns an accidental access into an error
+        # instead of a query per task
+        columns += [func.substr(models.Task.article, 1, SNIPPET_CHARS + 1), _event_count()]
+    query = (
+        db.query(models.Task, *columns)
+        .filter(models.Task.project_id == project_id)
+        .order_by(models.Task.id)
     )
-
+    if summary:
+        query = query.options(defer(models.Task.article, raiseload=True), defer(models.Task.events, raiseload=True))
     if status is not None:
-        if status:  # Reviewed
-            base_query = base_query.filter(review_exists_subq.exists())
-        else:  # Not reviewed
-            base_query = base_query.filter(~review_exists_subq.exists())
-
-    total = base_query.count()
-    tasks = base_query.offset(skip).limit(limit).all()
-
-    # Add status field to each task
-    reviewed_task_ids = {
-        r.task_id
-        for r in db.query(models.Review.task_id)
-        .filter(models.Review.reviewer_id == user_id)
-        .all()
-    }
+        query = query.filter(reviewed if status else ~reviewed)
+
+    if after is not None:
+        # Keyset mode: seek past the cursor on (project_id, id) instead of skipping rows
+        query = query.filter(models.Task.id > after)
+    else:
+        query = query.offset(skip)
 
-    # Attach a transient `status` field (True if reviewed, False if not)
-    for task in tasks:
-        task.status = task.id in reviewed_task_ids
+    tasks = []
+    for task, is_reviewed, *extra in query.limit(limit).all():
+        task.status = bool(is_reviewed)  # transient, not a column
+        if summary:
+            task.snippet, task.event_count = _snippet(extra[0]), extra[1]
+        tasks.append(task)
+
+    next_cursor = tasks[-1].id if limit and len(tasks) == limit else None
+    total = count_tasks(db, user_id, project_id, status)
+    return tasks, total, next_cursor
 
-    return tasks, total
 
+def project_has_tasks(db: Session, project_id: int) -> bool:
+    return db.query(exists().where(models.Task.project_id == project_id)).scalar()
 
 def get_tasks(db: Session, project_id: int, skip: int = 0, limit: int = 100):
     return db.query(models.Task).filter(models.Task.project_id == project_id).offset(skip).limit(limit).all()
@@ -100,67 +208,262 @@ def create_task(db: Session, task: schemas.CreateTask):
         id=task.id,  # Ensure id is set if provided
         project_id=task.project_id,
         article=task.article,  # Use 'article' for task content
-        events=json.dumps(task.events),  # Convert events to JSON string
+        events=task.events,  # JSON list text, checked by CreateTask
     )
+    dedup.screen_tasks(db, [{"id": task.id, "project_id": task.project_id, "article": task.article}])
+    stats.tasks_written(db, [_task_index_row(db_task)])
     db.add(db_task)
+    _index_tasks(db, [_task_index_row(db_task)])
     db.commit()
     db.refresh(db_task)
+    invalidate_task_totals(db_task.project_id)
     return db_task
 
 def update_task(db: Session, task_id: str, task: schemas.CreateTask):
     db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if db_task:
+        previous_project_id = db_task.project_id
+        stats.tasks_written(db, [{"id": task_id, "project_id": task.project_id}])
         for key, value in task.dict().items():
             setattr(db_task, key, value)
+        if db_task.project_id != previous_project_id:
+            # Reviews move with the task
+            db.query(models.LatestReview).filter(models.LatestReview.task_id == task_id).update(
+                {models.LatestReview.project_id: db_task.project_id}, synchronize_session=False
+            )
+        dedup.screen_tasks(db, [{"id": task_id, "project_id": db_task.project_id, "article": db_task.article}])
+        _index_tasks(db, [_task_index_row(db_task)])  # replaces the task's rows in the event store
         db.commit()
         db.refresh(db_task)
+        for project_id in {previous_project_id, db_task.project_id}:
+            invalidate_task_totals(project_id)
+            invalidate_review_reports(project_id)
         return db_task
     return None
 
+def realign_project_tasks(db: Session, project_id: int) -> int:
+    # Offsets live in the event store: realigning re-derives the LLM output's rows
+    count = event_store.index_project_tasks(db, project_id)
+    db.commit()
+    return count
+
 def delete_task(db: Session, task_id: str):
     db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if db_task:
+        stats.task_deleted(db, db_task)
         db.delete(db_task)
+        event_store.delete_task_events(db, task_id)
+        search.delete_tasks(db, [task_id])
+        assignment.delete_tasks(db, [task_id])
+        latest.delete_tasks(db, [task_id])
+        dedup.delete_tasks(db, [task_id])
+        consensus.delete_tasks(db, [task_id])
+        diffs.delete_tasks(db, [task_id])
         db.commit()
+        invalidate_task_totals(db_task.project_id)
+        invalidate_review_reports(db_task.project_id)
         return db_task
     return None
 
-def create_task_from_file(db: Session, project_id: int, file: bytes):
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes read from the upload spool at a time
+UPLOAD_BATCH_SIZE = 2000  # rows written per transaction
+UPLOAD_MAX_ERRORS = 100  # per-row errors echoed back to the client
+
+
+def _iter_lines(file, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    # Accept raw bytes/str as well as the binary spool behind an UploadFile
+    if isinstance(file, str):
+        file = file.encode("utf-8")
     if isinstance(file, bytes):
-        file_content = file.decode('utf-8')
-    else:
-        file_content = file
+        file = BytesIO(file)
+
+    # Incremental decoding keeps multi-byte characters split across chunks intact
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _detect_format(filename: str | None, first_line: str) -> str:
+    if filename:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == ".csv":
+            return "csv"
+        if ext in (".jsonl", ".ndjson", ".json"):
+            return "jsonl"
+    return "jsonl" if first_line.lstrip().startswith("{") else "csv"
+
+
+def _iter_jsonl_rows(lines):
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e.msg}"
+
+
+def _iter_csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # line_num points at the last physical line of the record (header is line 1)
+        yield reader.line_num, row, None
+
+
+def _task_row(task_data, project_id: int) -> dict:
+    if not isinstance(task_data, dict):
+        raise ValueError("Row must be an object")
+    task_id = task_data.get("id")
+    if task_id in (None, ""):
+        raise ValueError("Missing 'id'")
+    article = task_data.get("text", task_data.get("article"))
+    if not article:
+        raise ValueError("Missing 'text'")
+
+    events = task_data.get("events")
+    if isinstance(events, str):  # CSV cells carry events as JSON text
+        try:
+            events = json.loads(events) if events.strip() else None
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in 'events': {e.msg}")
+    if events is not None and not isinstance(events, list):
+        raise ValueError("'events' must be a list")
 
-    tasks = []
-    # task can be only in JSONL format
-    if file_content:
-        # JSONL format
-        for line in file_content:
-            task_data = json.loads(line)
-            tasks.append(task_data)
-    else:
-        # CSV format
-        csv_reader = csv.DictReader(StringIO(file_content))
-        for row in csv_reader:
-            tasks.append(row)
-
-    created_tasks = []
-    for task_data in tasks:
-        task_data['project_id'] = project_id  # Ensure project_id is set
-        db_task = models.Task(
-            project_id=project_id,
-            id=task_data.get('id', None),  # Ensure id is set if provided
-            article=task_data.get('text', None),  # Use 'text' for article content
-            events=json.dumps(task_data['events']),  # Optional field
-        )
-        db.add(db_task)
-        db.commit()
-        db.refresh(db_task)
-        created_tasks.append(db_task)
+    return {
+        "id": str(task_id),
+        "project_id": project_id,
+        "article": article,
+        "events": json.dumps(events) if events is not None else None,
+    }
 
+
+def _upsert_tasks(db: Session, rows: list[dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            db.merge(models.Task(**row))
+        return
+
+    insert = sqlite_insert if dialect == "sqlite" else pg_insert
+    stmt = insert(models.Task.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Task.id],
+        set_={
+            "article": stmt.excluded.article,
+            "events": stmt.excluded.events,
+            "modified_at": datetime.utcnow(),
+        },
+        # An id taken by another project is left alone, never moved over
+        where=models.Task.__table__.c.project_id == stmt.excluded.project_id,
+    )
+    db.execute(stmt, rows)
+
+
+def _write_task_rows(db: Session, rows: list[dict], duplicates: str, outcome: Counter) -> int:
+    # Duplicates are screened first: skipped and linked rows aren't written
+    attempt = Counter()
+    rows = dedup.screen_tasks(db, rows, duplicates, attempt)
+    stats.tasks_written(db, rows)
+    _upsert_tasks(db, rows)
+    _index_tasks(db, rows)
+    db.commit()
+    outcome.update(attempt)  # only once committed
+    return len(rows)
+
+
+def _foreign_ids(db: Session, project_id: int, task_ids: list[str]) -> set[str]:
+    # Ids already used by a task of another project
     return {
-        "content_type": "application/json",
-        "size": len(tasks)
+        task_id for (task_id,) in
+        db.query(models.Task.id).filter(models.Task.id.in_(task_ids), models.Task.project_id != project_id)
+    }
+
+
+def _flush_task_batch(db: Session, batch: dict, errors: list, duplicates: str, outcome: Counter) -> int:
+    # Upserts only replace tasks of the same project
+    project_id = next(iter(batch.values()))[1]["project_id"]
+    foreign = _foreign_ids(db, project_id, list(batch))
+    for task_id in [task_id for task_id in batch if task_id in foreign]:  # in file order
+        line_no, _ = batch.pop(task_id)
+        errors.append({"line": line_no, "id": task_id, "error": "Task id already used in another project"})
+    if not batch:
+        return 0
+    try:
+        return _write_task_rows(db, [row for _, row in batch.values()], duplicates, outcome)
+    except SQLAlchemyError:
+        db.rollback()
+
+    # Retry row by row so a single bad record doesn't sink the whole batch
+    written = 0
+    for line_no, row in batch.values():
+        try:
+            written += _write_task_rows(db, [row], duplicates, outcome)
+        except SQLAlchemyError as e:
+            db.rollback()
+            errors.append({"line": line_no, "id": row["id"], "error": str(getattr(e, "orig", None) or e)})
+    return written
+
+
+def create_task_from_file(
+    db: Session,
+    project_id: int,
+    file,
+    filename: str | None = None,
+    batch_size: int = UPLOAD_BATCH_SIZE,
+    duplicates: str = dedup.FLAG,
+):
+    lines = _iter_lines(file)
+    first_line = next(lines, "")
+    lines = itertools.chain([first_line], lines)
+    file_format = _detect_format(filename, first_line)
+    rows = _iter_jsonl_rows(lines) if file_format == "jsonl" else _iter_csv_rows(lines)
+
+    errors = []
+    written = 0
+    outcome = Counter()  # duplicates skipped/linked/flagged
+    # Keyed by task id: a repeated id within one batch keeps its last occurrence,
+    # which Postgres requires for ON CONFLICT and matches upsert semantics anyway
+    batch = {}
+    for line_no, task_data, error in rows:
+        if error is None:
+            try:
+                row = _task_row(task_data, project_id)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors.append({"line": line_no, "id": None, "error": error})
+            continue
+
+        batch.pop(row["id"], None)
+        batch[row["id"]] = (line_no, row)
+        if len(batch) >= batch_size:
+            written += _flush_task_batch(db, batch, errors, duplicates, outcome)
+            batch = {}
+
+    if batch:
+        written += _flush_task_batch(db, batch, errors, duplicates, outcome)
+
+    invalidate_task_totals(project_id)
+    invalidate_review_reports(project_id)
+
+    return {
+        "content_type": "application/jsonl" if file_format == "jsonl" else "text/csv",
+        "size": written,
+        "failed": len(errors),
+        "errors": errors[:UPLOAD_MAX_ERRORS],
+        "skipped": outcome["skipped"],
+        "linked": outcome["linked"],
+        "flagged": outcome["flagged"],
     }
 
 # review CRUD operations
@@ -176,95 +479,207 @@ def get_reviews(db: Session, task_id: str, skip: int = 0, limit: int = 100):
 def get_reviews_by_owner(db: Session, owner_id: int, skip: int = 0, limit: int = 100):
     return db.query(models.Review).filter(models.Review.reviewer_id == owner_id).offset(skip).limit(limit).all()
 
-def create_review(db: Session, review: schemas.CreateReview, task_id: str, reviewer_id: int):
+def invalidate_review_reports(project_id: int | None = None):
+    # Everything derived from a project's reviews and task events
+    evaluation.invalidate_scores(project_id)
+    agreement.invalidate_agreement(project_id)
+
+def _review_project_id(db: Session, db_review: models.Review):
+    return db.query(models.Task.project_id).filter(models.Task.id == db_review.task_id).scalar()
+
+def _add_review(db: Session, review: schemas.CreateReview, db_task: models.Task, reviewer_id: int):
+    # Writes the review and its per-review rows; the per-task views are refreshed
+    # by _refresh_reviewed_tasks once all of a transaction's reviews are in
     db_review = models.Review(
-        task_id=task_id,
+        task_id=db_task.id,
         reviewer_id=reviewer_id,
         events=review.events,
         comment=review.comment,  # Optional field for reviewer comments
     )
     db.add(db_review)
+    db.flush()
+    latest.set_current(db, db_review, db_task.project_id)
+    diffs.record_review_diff(db, db_review, db_task)
+    assignment.review_added(db, db_task.id, reviewer_id, db_review.id)
+    stats.review_added(db, db_task, reviewer_id)
+    return db_review
+
+def _refresh_reviewed_tasks(db: Session, db_tasks: list[models.Task], reviewer_id: int):
+    for db_task in db_tasks:
+        consensus.update_task_consensus(db, db_task.id, db_task.project_id)
+        event_store.index_reviewer(db, db_task.id, reviewer_id, db_task.project_id)
+    # Picks up the reviewer's spans from the event tables
+    search.index_tasks(db, [_task_index_row(db_task) for db_task in db_tasks])
+
+def create_review(db: Session, review: schemas.CreateReview, task_id: str, reviewer_id: int):
+    db_task = get_task(db, task_id)
+    if db_task is None:
+        # Nothing to review: never store a review without its derived rows
+        return None
+
+    # One transaction for the review and everything derived from it
+    db_review = _add_review(db, review, db_task, reviewer_id)
+    _refresh_reviewed_tasks(db, [db_task], reviewer_id)
     db.commit()
-    db.refresh(db_review)
-    
-    # update task status to completed
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if db_task:
-        db_task.status = True  # Mark task as completed
-        db.commit()
-        db.refresh(db_task)
+    invalidate_task_totals(db_task.project_id)
+    invalidate_review_reports(db_task.project_id)
     return db_review
 
+def _batch_hash(project_id: int, items: list[schemas.ReviewBatchItem]) -> str:
+    body = json.dumps([project_id, [item.model_dump() for item in items]], sort_keys=True)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+def create_reviews_batch(
+    db: Session,
+    project_id: int,
+    items: list[schemas.ReviewBatchItem],
+    reviewer_id: int,
+    idempotency_key: str | None = None,
+) -> dict:
+    # All accepted reviews are written in one transaction with per-item results.
+    # With an idempotency key, a replay returns the stored result instead of
+    # writing again; the key is stored in the same transaction as the reviews.
+    request_hash = _batch_hash(project_id, items)
+    if idempotency_key:
+        stored = idempotency.lookup(db, reviewer_id, idempotency_key, request_hash)
+        if stored is not None:
+            return dict(stored, replayed=True)
+
+    task_ids = {item.task_id for item in items}
+    tasks = {
+        task.id: task
+        for task in db.query(models.Task).filter(
+            models.Task.id.in_(task_ids), models.Task.project_id == project_id
+        )
+    }
+    results, reviewed = [], {}
+    for index, item in enumerate(items):
+        db_task = tasks.get(item.task_id)
+        error = None
+        if db_task is None:
+            error = "Task not found"
+        elif item.events is not None:
+            try:
+                json.loads(item.events)
+            except json.JSONDecodeError as e:
+                error = f"Invalid JSON in 'events': {e.msg}"
+        if error:
+            results.append({"index": index, "task_id": item.task_id, "status": "failed", "error": error})
+            continue
+        db_review = _add_review(db, item, db_task, reviewer_id)
+        reviewed[db_task.id] = db_task
+        results.append({"index": index, "task_id": item.task_id, "status": "created", "review_id": db_review.id})
+
+    _refresh_reviewed_tasks(db, list(reviewed.values()), reviewer_id)
+    created = sum(1 for result in results if result["status"] == "created")
+    response = {"results": results, "created": created, "failed": len(results) - created}
+    if idempotency_key:
+        idempotency.store(db, reviewer_id, idempotency_key, project_id, request_hash, response)
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same key committed concurrently: answer with what that request stored
+        db.rollback()
+        stored = idempotency.lookup(db, reviewer_id, idempotency_key, request_hash) if idempotency_key else None
+        if stored is None:
+            raise
+        return dict(stored, replayed=True)
+
+    if reviewed:
+        invalidate_task_totals(project_id)
+        invalidate_review_reports(project_id)
+    return dict(response, replayed=False)
+
 def update_review(db: Session, review_id: int, review: schemas.CreateReview):
     db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
     if db_review:
         for key, value in review.dict().items():
             setattr(db_review, key, value)
+        db.flush()
+        db_task = get_task(db, db_review.task_id)
+        project_id = db_task.project_id if db_task else None
+        if db_task:
+            stats.touch(db, project_id)
+            latest.refresh(db, db_task.id, db_review.reviewer_id, project_id)
+            consensus.update_task_consensus(db, db_task.id, project_id)
+            diffs.record_review_diff(db, db_review, db_task)
+            _index_review(db, db_task, db_review.reviewer_id)
         db.commit()
         db.refresh(db_review)
+        invalidate_review_reports(project_id)
         return db_review
     return None
 
 def delete_review(db: Session, review_id: int):
     db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
     if db_review:
+        project_id = _review_project_id(db, db_review)
         db.delete(db_review)
+        db.flush()
+        diffs.delete_review_diff(db, db_review)
+        db_task = get_task(db, db_review.task_id)
+        if db_task:
+            latest.refresh(db, db_task.id, db_review.reviewer_id, project_id)
+            consensus.update_task_consensus(db, db_task.id, project_id)
+            _index_review(db, db_task, db_review.reviewer_id)
+            assignment.review_removed(db, db_task.id, db_review.reviewer_id)
+            stats.review_removed(db, db_task, db_review.reviewer_id)
         db.commit()
+        invalidate_task_totals(project_id)
+        invalidate_review_reports(project_id)
         return db_review
     return None
 
 
-def export_tasks_to_jsonl(db: Session, project_id: int) -> str:
-    project_title = db.query(models.Project.name).filter(models.Project.id == project_id).scalar()
-    safe_title = project_title.replace(" ", "_").lower()
-    file_path = f"./exports/project_{safe_title}_reviews.jsonl"
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+EXPORT_CHUNK_SIZE = 500  # rows fetched per round trip while exporting
 
-    tasks = db.query(models.Task).filter(models.Task.project_id == project_id).all()
 
-    # Subquery to get latest review per user per task
-    sub_latest = (
-        db.query(
-            models.Review.task_id,
-            models.Review.reviewer_id,
-            func.max(models.Review.created_at).label("latest_time")
-        )
-        .group_by(models.Review.task_id, models.Review.reviewer_id)
-        .subquery()
+def iter_project_export(db: Session, project_id: int):
+    # One pass over reviewed tasks joined to their current reviews (one per
+    # reviewer), in task id order so each task's reviews arrive together
+    rows = db.execute(
+        select(models.Task, models.Review)
+        .join(models.LatestReview, models.LatestReview.task_id == models.Task.id)
+        .join(models.Review, models.Review.id == models.LatestReview.review_id)
+        .where(models.Task.project_id == project_id)
+        .order_by(models.Task.id, models.LatestReview.reviewer_id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
     )
-
-    # Join to get full review info
-    LatestReview = aliased(models.Review)
-    latest_reviews = (
-        db.query(LatestReview)
-        .join(
-            sub_latest,
-            (LatestReview.task_id == sub_latest.c.task_id) &
-            (LatestReview.reviewer_id == sub_latest.c.reviewer_id) &
-            (LatestReview.created_at == sub_latest.c.latest_time)
-        )
-        .all()
-    )
-
-    # Group reviews by task_id
-    reviews_by_task = defaultdict(list)
-    for review in latest_reviews:
-        reviews_by_task[review.task_id].append({
-            "reviewer_id": review.reviewer_id,
-            "events": json.loads(review.events) if review.events else None,
-            "comment": review.comment,
-        })
-
-    # Write each task and its reviews
-    with open(file_path, 'w', encoding='utf-8') as f:
-        for task in tasks:
-            row = {
-                "id": task.id,
-                "article": task.article,
-                "original_events": json.loads(task.events) if task.events else None,
-                "reviewed_events": reviews_by_task.get(task.id, [])
-            }
-            if row["reviewed_events"]:
-                f.write(json.dumps(row, ensure_ascii=False) + '\n')
-
-    return file_path
+    for _, group in itertools.groupby(rows, key=lambda row: row[0].id):
+        group = list(group)
+        task = group[0][0]
+        yield {
+            "id": task.id,
+            "article": task.article,
+            "original_events": json.loads(task.events) if task.events else None,
+            "reviewed_events": [
+                {
+                    "reviewer_id": review.reviewer_id,
+                    "events": json.loads(review.events) if review.events else None,
+                    "comment": review.comment,
+                }
+                for _, review in group
+            ],
+        }
+
+
+def stream_export_jsonl(project_id: int, compress: bool = False):
+    # Owns its session: the response body is produced after the request's session is gone
+    db = ReadSessionLocal()
+    try:
+        # wbits=31 produces a gzip container rather than a raw zlib stream
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        buffer = []
+        for row in iter_project_export(db, project_id):
+            buffer.append(json.dumps(row, ensure_ascii=False) + "\n")
+            if len(buffer) >= EXPORT_CHUNK_SIZE:
+                data = "".join(buffer).encode("utf-8")
+                buffer = []
+                yield compressor.compress(data) if compressor else data
+        data = "".join(buffer).encode("utf-8")
+        if compressor:
+            yield compressor.compress(data) + compressor.flush()
+        elif data:
+            yield data
+    finally:
+        db.close()
@@ -0,0 +1,302 @@
+import hashlib
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from itertools import chain
+import numpy as np
+from sqlalchemy.orm import Session, aliased
+from backend.proj import models
+
+# Duplicate articles across all projects. Exact copies share the hash of the
+# normalized article; near-duplicates are found with MinHash signatures over
+# word shingles and LSH banding, so a lookup is a few indexed probes of
+# task_lsh_buckets however large the corpus is. Only canonical tasks are put
+# in the buckets; copies point at them through duplicate_of.
+
+FLAG = "flag"  # store the copy, marked with its canonical task
+SKIP = "skip"  # don't store the copy
+LINK = "link"  # don't store the copy, record its id as an alias of the canonical task
+MODES = (FLAG, SKIP, LINK)
+
+NUM_PERM = 48
+# 6 rows per band: a pair at 0.8 similarity shares a bucket with p ~ 0.91 (0.98
+# at 0.85), one at 0.3 (articles sharing only boilerplate) with p < 0.01
+BANDS = 8
+SHINGLE_WORDS = 3
+# Estimated Jaccard similarity from which an article counts as a near-duplicate
+NEAR_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+LOOKUP_CHUNK_SIZE = 500  # keys per IN (...) lookup
+# Bucket probes come BANDS per article: fewer, larger lookups (SQLite >= 3.32
+# binds up to 32766 parameters, Postgres 65535)
+BUCKET_LOOKUP_CHUNK_SIZE = 8000
+MINHASH_CHUNK_SIZE = 32  # articles hashed per numpy pass, sized to stay in cache
+REBUILD_BATCH_SIZE = 1000  # tasks fingerprinted per batch by rebuild_project
+
+_WORD = re.compile(r"\w+")
+_SHIFT = np.uint64(32)
+
+
+# Hash parameters derived from fixed digests, so signatures stay comparable
+# across processes, restarts and numpy versions
+def _params(prefix: bytes, count: int) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(b"%s%d" % (prefix, i), digest_size=8).digest(), "big") for i in range(count)],
+        dtype=np.uint64,
+    )
+
+
+_A = _params(b"a", NUM_PERM) | np.uint64(1)
+_B = _params(b"b", NUM_PERM)
+_ROWS = NUM_PERM // BANDS
+_SHINGLE_MUL = _params(b"shingle", SHINGLE_WORDS) | np.uint64(1)
+_BAND_MUL = _params(b"row", _ROWS) | np.uint64(1)
+_BAND_OFFSET = _params(b"band", BANDS)  # keeps equal rows in different bands apart
+
+
+class Fingerprint:
+    __slots__ = ("content_hash", "signature", "buckets")
+
+    def __init__(self, content_hash: str, signature: np.ndarray, buckets: list[int]):
+        self.content_hash = content_hash
+        self.signature = signature
+        self.buckets = buckets
+
+
+def fingerprints(articles: list[str]) -> list[Fingerprint]:
+    # One pass of numpy over the shingles of all the articles. All arithmetic is
+    # on uint64 and wraps mod 2**64: a shingle hash combines its words' crc32s,
+    # each permutation is a multiply-shift hash of it (no modulo) and a band's
+    # bucket combines its rows the same way
+    if not articles:
+        return []
+    words = [_WORD.findall(article.lower()) for article in articles]
+    hashes = [hashlib.sha256(" ".join(w).encode("utf-8")).hexdigest() for w in words]
+    for w in words:
+        w.extend([""] * (SHINGLE_WORDS - len(w)))  # a short article is one shingle
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    ids = np.fromiter(
+        map(zlib.crc32, map(str.encode, chain.from_iterable(words))), dtype=np.uint64, count=int(lengths.sum())
+    )
+    count = len(ids) - SHINGLE_WORDS + 1
+    shingles = ids[:count] * _SHINGLE_MUL[0]
+    for k in range(1, SHINGLE_WORDS):
+        shingles += ids[k:k + count] * _SHINGLE_MUL[k]
+    # Drop the shingles running from one article into the next
+    ends = np.cumsum(lengths)[:-1]
+    keep = np.ones(count, dtype=bool)
+    for k in range(1, SHINGLE_WORDS):
+        keep[ends - k] = False
+    shingles = shingles[keep]
+    offsets = np.concatenate(([0], np.cumsum(lengths - (SHINGLE_WORDS - 1))))
+
+    signatures = np.empty((len(articles), NUM_PERM), dtype=np.uint32)
+    for i in range(0, len(articles), MINHASH_CHUNK_SIZE):
+        j = min(i + MINHASH_CHUNK_SIZE, len(articles))
+        hashed = np.multiply.outer(shingles[offsets[i]:offsets[j]], _A)
+        hashed += _B
+        hashed >>= _SHIFT
+        signatures[i:j] = np.minimum.reduceat(hashed, offsets[i:j] - offsets[i], axis=0)
+    bands = (signatures.reshape(-1, BANDS, _ROWS).astype(np.uint64) * _BAND_MUL).sum(axis=2) + _BAND_OFFSET
+    buckets = bands.view(np.int64).tolist()  # BigInteger is signed
+    return [Fingerprint(*fp) for fp in zip(hashes, signatures, buckets)]
+
+
+def _best_match(signature: np.ndarray, candidates: list[str], signatures: dict) -> tuple | None:
+    # The most similar candidate at or above NEAR_THRESHOLD, compared in one go
+    if not candidates:
+        return None
+    similarity = np.count_nonzero(np.stack([signatures[c] for c in candidates]) == signature, axis=1) / NUM_PERM
+    best = int(similarity.argmax())
+    if similarity[best] < NEAR_THRESHOLD:
+        return None
+    return candidates[best], float(similarity[best]), False
+
+
+def _load_signature(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def _chunks(items: list, size: int = LOOKUP_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _existing(db: Session, prints: dict[str, Fingerprint]):
+    # Exact and LSH candidates already in the index: hash -> root task id,
+    # bucket -> task ids, task id -> signature
+    exact = {}
+    hashes = list({fp.content_hash for fp in prints.values()})
+    for chunk in _chunks(hashes):
+        rows = db.query(
+            models.TaskFingerprint.task_id, models.TaskFingerprint.content_hash, models.TaskFingerprint.duplicate_of
+        ).filter(models.TaskFingerprint.content_hash.in_(chunk))
+        for task_id, content_hash, duplicate_of in rows:
+            exact.setdefault(content_hash, set()).add(duplicate_of or task_id)
+
+    # Candidates come with their signatures: one join instead of a second
+    # round of lookups by task id
+    buckets, signatures = defaultdict(set), {}
+    keys = list({key for fp in prints.values() for key in fp.buckets})
+    for chunk in _chunks(keys, BUCKET_LOOKUP_CHUNK_SIZE):
+        rows = (
+            db.query(models.TaskLshBucket.bucket, models.TaskLshBucket.task_id, models.TaskFingerprint.signature)
+            .join(models.TaskFingerprint, models.TaskFingerprint.task_id == models.TaskLshBucket.task_id)
+            .filter(models.TaskLshBucket.bucket.in_(chunk))
+        )
+        for bucket, task_id, signature in rows:
+            buckets[bucket].add(task_id)
+            if task_id not in signatures:
+                signatures[task_id] = _load_signature(signature)
+    return exact, buckets, signatures
+
+
+def _delete_index(db: Session, task_ids: list[str]):
+    for chunk in _chunks(task_ids):
+        db.query(models.TaskLshBucket).filter(models.TaskLshBucket.task_id.in_(chunk)).delete(synchronize_session=False)
+        db.query(models.TaskFingerprint).filter(models.TaskFingerprint.task_id.in_(chunk)).delete(
+            synchronize_session=False
+        )
+
+
+def screen_tasks(db: Session, rows: list[dict], mode: str = FLAG, outcome: Counter | None = None) -> list[dict]:
+    # Called with upload rows (id/project_id/article) before they are written;
+    # returns the rows to store and indexes them. Copies within `rows` are
+    # caught too. Callers commit.
+    if not rows:
+        return []
+    prints = dict(zip((row["id"] for row in rows), fingerprints([row["article"] for row in rows])))
+    exact, buckets, signatures = _existing(db, prints)
+
+    kept, fingerprint_rows, bucket_rows, alias_rows = [], [], [], []
+    for row in rows:
+        task_id, fp = row["id"], prints[row["id"]]
+        # Never a duplicate of its own earlier upload
+        roots = exact.get(fp.content_hash, set()) - {task_id}
+        match = (min(roots), 1.0, True) if roots else None
+        if match is None:
+            candidates = {candidate for bucket in fp.buckets for candidate in buckets.get(bucket, ())}
+            candidates.discard(task_id)
+            match = _best_match(fp.signature, sorted(c for c in candidates if c in signatures), signatures)
+
+        if match is not None and mode in (SKIP, LINK):
+            if outcome is not None:
+                outcome["skipped" if mode == SKIP else "linked"] += 1
+            if mode == LINK:
+                alias_rows.append({
+                    "alias_id": task_id, "project_id": row["project_id"],
+                    "task_id": match[0], "similarity": match[1], "exact": match[2],
+                })
+            continue
+
+        kept.append(row)
+        fingerprint_rows.append({
+            "task_id": task_id,
+            "project_id": row["project_id"],
+            "content_hash": fp.content_hash,
+            "signature": fp.signature.astype("<u4").tobytes(),
+            "duplicate_of": match[0] if match else None,
+            "similarity": match[1] if match else None,
+            "exact": bool(match and match[2]),
+        })
+        if match is not None:
+            if outcome is not None:
+                outcome["flagged"] += 1
+            continue
+        # A new canonical task: later rows of this batch can match it
+        exact.setdefault(fp.content_hash, set()).add(task_id)
+        signatures[task_id] = fp.signature
+        for bucket in fp.buckets:
+            buckets[bucket].add(task_id)
+            bucket_rows.append({"bucket": bucket, "task_id": task_id})
+
+    _delete_index(db, [row["id"] for row in kept])
+    if fingerprint_rows:
+        db.execute(models.TaskFingerprint.__table__.insert(), fingerprint_rows)
+    if bucket_rows:
+        db.execute(models.TaskLshBucket.__table__.insert(), bucket_rows)
+    if alias_rows:
+        for chunk in _chunks([row["alias_id"] for row in alias_rows]):
+            db.query(models.TaskAlias).filter(models.TaskAlias.alias_id.in_(chunk)).delete(synchronize_session=False)
+        db.execute(models.TaskAlias.__table__.insert(), alias_rows)
+    return kept
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    _delete_index(db, task_ids)
+    for chunk in _chunks(task_ids):
+        db.query(models.TaskAlias).filter(models.TaskAlias.task_id.in_(chunk)).delete(synchronize_session=False)
+        # Copies of a deleted task are no longer copies of anything stored
+        db.query(models.TaskFingerprint).filter(models.TaskFingerprint.duplicate_of.in_(chunk)).update(
+            {"duplicate_of": None, "similarity": None, "exact": False}, synchronize_session=False
+        )
+
+
+def delete_project(db: Session, project_id: int):
+    task_ids = [
+        task_id for (task_id,) in
+        db.query(models.TaskFingerprint.task_id).filter(models.TaskFingerprint.project_id == project_id)
+    ]
+    delete_tasks(db, task_ids)
+    db.query(models.TaskAlias).filter(models.TaskAlias.project_id == project_id).delete(synchronize_session=False)
+
+
+def rebuild_project(db: Session, project_id: int) -> int:
+    # Re-fingerprints a project's tasks (flag mode), e.g. for tasks imported
+    # before the index existed; existing flags elsewhere are left as they are
+    task_ids = [task_id for (task_id,) in db.query(models.Task.id).filter(models.Task.project_id == project_id)]
+    _delete_index(db, task_ids)
+    count = 0
+    for chunk in _chunks(task_ids, REBUILD_BATCH_SIZE):
+        rows = [
+            {"id": task_id, "project_id": project_id, "article": article}
+            for task_id, article in db.query(models.Task.id, models.Task.article).filter(models.Task.id.in_(chunk))
+        ]
+        count += len(screen_tasks(db, sorted(rows, key=lambda r: r["id"]), FLAG))
+    db.commit()
+    return count
+
+
+def duplicate_report(db: Session, project_id: int, skip: int = 0, limit: int = 100) -> dict:
+    # Flagged copies stored in the project and ids linked instead of stored
+    canonical = aliased(models.TaskFingerprint)
+    flagged = (
+        db.query(
+            models.TaskFingerprint.task_id, models.TaskFingerprint.duplicate_of, canonical.project_id,
+            models.TaskFingerprint.similarity, models.TaskFingerprint.exact,
+        )
+        .outerjoin(canonical, canonical.task_id == models.TaskFingerprint.duplicate_of)
+        .filter(models.TaskFingerprint.project_id == project_id, models.TaskFingerprint.duplicate_of.is_not(None))
+    )
+    linked = (
+        db.query(
+            models.TaskAlias.alias_id, models.TaskAlias.task_id, canonical.project_id,
+            models.TaskAlias.similarity, models.TaskAlias.exact,
+        )
+        .outerjoin(canonical, canonical.task_id == models.TaskAlias.task_id)
+        .filter(models.TaskAlias.project_id == project_id)
+    )
+    flagged_count, linked_count = flagged.count(), linked.count()
+    entries = [
+        (row, False) for row in flagged.order_by(models.TaskFingerprint.task_id).limit(skip + limit)
+    ] + [
+        (row, True) for row in linked.order_by(models.TaskAlias.alias_id).limit(skip + limit)
+    ]
+    entries.sort(key=lambda entry: entry[0][0])
+    return {
+        "project_id": project_id,
+        "flagged": flagged_count,
+        "linked": linked_count,
+        "duplicates": [
+            {
+                "task_id": task_id,
+                "duplicate_of": duplicate_of,
+                "duplicate_project_id": duplicate_project_id,
+                "similarity": similarity,
+                "exact": exact,
+                "linked": linked_entry,
+            }
+            for (task_id, duplicate_of, duplicate_project_id, similarity, exact), linked_entry
+            in entries[skip:skip + limit]
+        ],
+    }
@@ -0,0 +1,231 @@
+from collections import Counter
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.proj import models, latest
+from backend.proj.events import parse_events, normalize_text
+
+KIND_TRIGGER = "trigger"
+KIND_EVENT_TYPE = "event_type"
+KIND_ARGUMENT = "argument"
+
+ACTION_KEPT = "kept"
+ACTION_EDITED = "edited"  # trigger or argument span changed
+ACTION_ROLE = "role"  # argument kept its span but moved to another role
+ACTION_ADDED = "added"
+ACTION_REMOVED = "removed"
+
+
+def _tokens(text: str) -> set:
+    return set(normalize_text(text).split())
+
+
+def _align(original: list[dict], reviewed: list[dict]):
+    # Pairs original and reviewed events: same trigger text first, then the span a
+    # correction replaced, then any remaining pair whose triggers share a token
+    pairs = []
+    left = dict(enumerate(original))
+    right = dict(enumerate(reviewed))
+
+    def match(key_left, key_right):
+        index = {}
+        for i, event in left.items():
+            key = key_left(event)
+            if key:
+                index.setdefault(key, []).append(i)
+        for j, event in list(right.items()):
+            candidates = index.get(key_right(event))
+            if candidates:
+                pairs.append((left.pop(candidates.pop(0)), right.pop(j)))
+
+    match(lambda e: normalize_text(e["trigger"]["text"]), lambda e: normalize_text(e["trigger"]["text"]))
+    match(
+        lambda e: normalize_text(e["trigger"]["text"]),
+        lambda e: normalize_text(e["trigger"].get("original") or ""),
+    )
+    for j, event in list(right.items()):
+        tokens = _tokens(event["trigger"]["text"])
+        for i, candidate in left.items():
+            if tokens & _tokens(candidate["trigger"]["text"]):
+                pairs.append((left.pop(i), right.pop(j)))
+                break
+
+    return pairs, list(left.values()), list(right.values())
+
+
+def _row(kind, action, event_type, role=None):
+    return {"kind": kind, "action": action, "event_type": event_type or None, "role": role}
+
+
+def _diff_arguments(original: dict, reviewed: dict, event_type: str):
+    # Arguments are multisets of (role, text): a role can hold several spans.
+    # Unchanged pairs are kept; of the rest, a span now filed under another role
+    # is a role change, then a role whose span changed is an edit.
+    before = Counter((a["role"], normalize_text(a["text"])) for a in original["arguments"])
+    after = Counter((a["role"], normalize_text(a["text"])) for a in reviewed["arguments"])
+    kept = before & after
+    removed = sorted((before - after).elements())
+    added = sorted((after - before).elements())
+    rows = [_row(KIND_ARGUMENT, ACTION_KEPT, event_type, role) for role, _ in sorted(kept.elements())]
+
+    def pair(action, same):
+        for item in list(removed):
+            match = next((other for other in added if same(item, other)), None)
+            if match is not None:
+                removed.remove(item)
+                added.remove(match)
+                rows.append(_row(KIND_ARGUMENT, action, event_type, item[0]))
+
+    pair(ACTION_ROLE, lambda a, b: a[1] == b[1])
+    pair(ACTION_EDITED, lambda a, b: a[0] == b[0])
+    rows.extend(_row(KIND_ARGUMENT, ACTION_REMOVED, event_type, role) for role, _ in removed)
+    rows.extend(_row(KIND_ARGUMENT, ACTION_ADDED, event_type, role) for role, _ in added)
+    return rows
+
+
+def diff_events(original_raw, reviewed_raw) -> list[dict]:
+    # One row per trigger, event type and argument of the LLM output vs the review
+    original = parse_events(original_raw)
+    reviewed = parse_events(reviewed_raw)
+    pairs, removed, added = _align(original, reviewed)
+
+    rows = []
+    for before, after in pairs:
+        same_trigger = normalize_text(before["trigger"]["text"]) == normalize_text(after["trigger"]["text"])
+        rows.append(_row(KIND_TRIGGER, ACTION_KEPT if same_trigger else ACTION_EDITED, after["event_type"]))
+        same_type = before["event_type"] == after["event_type"]
+        # Type rows are attributed to the LLM's type: that is the error being corrected
+        rows.append(_row(KIND_EVENT_TYPE, ACTION_KEPT if same_type else ACTION_EDITED, before["event_type"]))
+        rows.extend(_diff_arguments(before, after, after["event_type"]))
+    for event in removed:
+        rows.append(_row(KIND_TRIGGER, ACTION_REMOVED, event["event_type"]))
+        rows.extend(_row(KIND_ARGUMENT, ACTION_REMOVED, event["event_type"], a["role"]) for a in event["arguments"])
+    for event in added:
+        rows.append(_row(KIND_TRIGGER, ACTION_ADDED, event["event_type"]))
+        rows.extend(_row(KIND_ARGUMENT, ACTION_ADDED, event["event_type"], a["role"]) for a in event["arguments"])
+    return rows
+
+
+def _newest_review_id(db: Session, task_id: str, reviewer_id: int):
+    # Same ordering as latest.refresh, so "current" diffs follow LatestReview
+    return (
+        db.query(models.Review.id)
+        .filter(models.Review.task_id == task_id, models.Review.reviewer_id == reviewer_id)
+        .order_by(*latest.NEWEST_FIRST)
+        .limit(1)
+        .scalar()
+    )
+
+
+def record_review_diff(db: Session, review: models.Review, task: models.Task):
+    # Called inside the review write; callers commit. Earlier reviews of the same
+    # reviewer stop counting so stats always reflect each reviewer's latest word.
+    db.query(models.ReviewDiff).filter(models.ReviewDiff.review_id == review.id).delete(
+        synchronize_session=False
+    )
+    current = _newest_review_id(db, task.id, review.reviewer_id) == review.id
+    if current:
+        db.query(models.ReviewDiff).filter(
+            models.ReviewDiff.task_id == task.id,
+            models.ReviewDiff.reviewer_id == review.reviewer_id,
+            models.ReviewDiff.review_id != review.id,
+        ).update({models.ReviewDiff.current: False}, synchronize_session=False)
+
+    rows = [
+        dict(
+            row,
+            review_id=review.id,
+            task_id=task.id,
+            project_id=task.project_id,
+            reviewer_id=review.reviewer_id,
+            current=current,
+        )
+        for row in diff_events(task.events, review.events)
+    ]
+    if rows:
+        db.execute(models.ReviewDiff.__table__.insert(), rows)
+
+
+def delete_review_diff(db: Session, review: models.Review):
+    # Called once the review row itself is gone
+    db.query(models.ReviewDiff).filter(models.ReviewDiff.review_id == review.id).delete(
+        synchronize_session=False
+    )
+    # The reviewer's newest remaining review, if any, becomes current again
+    previous = _newest_review_id(db, review.task_id, review.reviewer_id)
+    if previous is not None:
+        db.query(models.ReviewDiff).filter(models.ReviewDiff.review_id == previous).update(
+            {models.ReviewDiff.current: True}, synchronize_session=False
+        )
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    db.query(models.ReviewDiff).filter(models.ReviewDiff.task_id.in_(task_ids)).delete(synchronize_session=False)
+
+
+def delete_project(db: Session, project_id: int):
+    db.query(models.ReviewDiff).filter(models.ReviewDiff.project_id == project_id).delete(synchronize_session=False)
+
+
+def rebuild_project_diffs(db: Session, project_id: int) -> int:
+    reviews = (
+        db.query(models.Review, models.Task)
+        .join(models.Task, models.Task.id == models.Review.task_id)
+        .filter(models.Task.project_id == project_id)
+        .order_by(models.Review.id)
+    )
+    count = 0
+    for review, task in reviews.all():
+        record_review_diff(db, review, task)
+        count += 1
+    db.commit()
+    return count
+
+
+def correction_stats(db: Session, project_id: int, top: int = 10) -> dict:
+    current = (
+        models.ReviewDiff.project_id == project_id,
+        models.ReviewDiff.current.is_(True),
+    )
+    totals = {}
+    for kind, action, count in (
+        db.query(models.ReviewDiff.kind, models.ReviewDiff.action, func.count())
+        .filter(*current)
+        .group_by(models.ReviewDiff.kind, models.ReviewDiff.action)
+    ):
+        totals.setdefault(kind, {})[action] = count
+
+    breakdown = {
+        kind: {
+            "total": sum(actions.values()),
+            "counts": actions,
+            "percent": {a: 100.0 * n / sum(actions.values()) for a, n in actions.items()},
+        }
+        for kind, actions in totals.items()
+    }
+
+    count = func.count().label("count")
+    errors = (
+        db.query(
+            models.ReviewDiff.kind,
+            models.ReviewDiff.action,
+            models.ReviewDiff.event_type,
+            models.ReviewDiff.role,
+            count,
+        )
+        .filter(*current, models.ReviewDiff.action != ACTION_KEPT)
+        .group_by(
+            models.ReviewDiff.kind,
+            models.ReviewDiff.action,
+            models.ReviewDiff.event_type,
+            models.ReviewDiff.role,
+        )
+        .order_by(count.desc())
+        .limit(top)
+    )
+    return {
+        "items": breakdown,
+        "top_errors": [
+            {"kind": k, "action": a, "event_type": t, "role": r, "count": n}
+            for k, a, t, r, n in errors
+        ],
+    }
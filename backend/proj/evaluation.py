@@ -0,0 +1,175 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from backend.cache import TTLCache
+from backend.proj import models, stats
+from backend.proj.consensus import STATUS_AGREED
+from backend.proj.events import parse_events, normalize_text
+import numpy as np
+
+SOURCE_CONSENSUS = "consensus"  # agreed ground truth only
+SOURCE_REVIEWS = "reviews"  # every reviewer's latest review is a reference
+
+FETCH_CHUNK_SIZE = 1000
+
+# (project_id, source) -> (data version, scores); entries from before the
+# project's current version (see stats.data_version) are recomputed
+_scores_cache = TTLCache(maxsize=256, ttl=3600)
+
+
+def invalidate_scores(project_id: int | None = None):
+    if project_id is None:
+        _scores_cache.clear()
+        return
+    for source in (SOURCE_CONSENSUS, SOURCE_REVIEWS):
+        _scores_cache.pop((project_id, source))
+
+
+class _Encoder:
+    # Interns strings to ints and collects one row per trigger/typed trigger/argument
+
+    def __init__(self):
+        self.vocab = {}
+        self.triggers = []  # (doc, trigger)
+        self.typed = []  # (doc, trigger, type)
+        self.arguments = []  # (doc, type, role, text)
+
+    def intern(self, value: str) -> int:
+        return self.vocab.setdefault(value, len(self.vocab))
+
+    def add(self, doc: int, events: list[dict]):
+        for event in events:
+            trigger = self.intern(normalize_text(event["trigger"]["text"]))
+            event_type = self.intern(event["event_type"])
+            self.triggers.append((doc, trigger))
+            self.typed.append((doc, trigger, event_type))
+            for arg in event["arguments"]:
+                self.arguments.append(
+                    (doc, event_type, self.intern(arg["role"]), self.intern(normalize_text(arg["text"])))
+                )
+
+    def arrays(self):
+        return (
+            np.array(self.triggers, dtype=np.int64).reshape(-1, 2),
+            np.array(self.typed, dtype=np.int64).reshape(-1, 3),
+            np.array(self.arguments, dtype=np.int64).reshape(-1, 4),
+        )
+
+
+def _prf(tp, fp, fn):
+    tp, fp, fn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return precision, recall, f1
+
+
+def _score(gold: np.ndarray, pred: np.ndarray, group_col: int | None = None):
+    # Rows are matched exactly: both sides are de-duplicated, mapped to shared
+    # ids with one np.unique and intersected, so everything stays vectorized
+    gold = np.unique(gold, axis=0)
+    pred = np.unique(pred, axis=0)
+    rows, ids = np.unique(np.concatenate([gold, pred]), axis=0, return_inverse=True)
+    ids = ids.ravel()
+    matched = np.intersect1d(ids[: len(gold)], ids[len(gold):], assume_unique=True)
+
+    tp, n_gold, n_pred = len(matched), len(gold), len(pred)
+    p, r, f = _prf(tp, n_pred - tp, n_gold - tp)
+    result = {"micro": _as_dict(p, r, f, tp, n_pred - tp, n_gold - tp)}
+    if group_col is None:
+        return result, None
+
+    # Per-group counts via bincount over the grouping column (event type or role)
+    size = int(rows[:, group_col].max()) + 1 if len(rows) else 0
+    tp_g = np.bincount(rows[matched, group_col], minlength=size)
+    gold_g = np.bincount(gold[:, group_col], minlength=size)
+    pred_g = np.bincount(pred[:, group_col], minlength=size)
+    present = np.flatnonzero(gold_g + pred_g)
+    p, r, f = _prf(tp_g[present], (pred_g - tp_g)[present], (gold_g - tp_g)[present])
+    result["macro"] = _as_dict(p.mean(), r.mean(), f.mean()) if len(present) else _as_dict(0, 0, 0)
+    groups = {
+        int(g): _as_dict(p[i], r[i], f[i], tp_g[g], pred_g[g] - tp_g[g], gold_g[g] - tp_g[g])
+        for i, g in enumerate(present)
+    }
+    return result, groups
+
+
+def _as_dict(precision, recall, f1, tp=None, fp=None, fn=None):
+    scores = {"precision": float(precision), "recall": float(recall), "f1": float(f1)}
+    if tp is not None:
+        scores.update(tp=int(tp), fp=int(fp), fn=int(fn))
+    return scores
+
+
+def _references(db: Session, project_id: int, source: str):
+    # Yields (task_id, events JSON) for every reference annotation of the project
+    if source == SOURCE_CONSENSUS:
+        query = (
+            select(models.Consensus.task_id, models.Consensus.events)
+            .where(
+                models.Consensus.project_id == project_id,
+                models.Consensus.status == STATUS_AGREED,
+            )
+        )
+        yield from db.execute(query.execution_options(yield_per=FETCH_CHUNK_SIZE))
+        return
+
+    query = (
+        select(models.Review.task_id, models.Review.events)
+        .join(models.LatestReview, models.LatestReview.review_id == models.Review.id)
+        .where(models.LatestReview.project_id == project_id)
+        .order_by(models.LatestReview.task_id, models.LatestReview.reviewer_id)
+    )
+    yield from db.execute(query.execution_options(yield_per=FETCH_CHUNK_SIZE))
+
+
+def compute_scores(db: Session, project_id: int, source: str = SOURCE_CONSENSUS) -> dict:
+    # Every reference is paired with the LLM events of its task as its own document
+    references = list(_references(db, project_id, source))
+    task_ids = {task_id for task_id, _ in references}
+
+    predictions = {}
+    task_query = select(models.Task.id, models.Task.events).where(models.Task.project_id == project_id)
+    for task_id, events in db.execute(task_query.execution_options(yield_per=FETCH_CHUNK_SIZE)):
+        if task_id in task_ids:
+            predictions[task_id] = parse_events(events)
+
+    gold, pred = _Encoder(), _Encoder()
+    pred.vocab = gold.vocab  # one vocabulary so ids compare across sides
+    documents = 0
+    for task_id, events in references:
+        if task_id not in predictions:
+            continue
+        gold.add(documents, parse_events(events))
+        pred.add(documents, predictions[task_id])
+        documents += 1
+
+    gold_triggers, gold_typed, gold_args = gold.arrays()
+    pred_triggers, pred_typed, pred_args = pred.arrays()
+    names = {i: value for value, i in gold.vocab.items()}
+
+    trigger, _ = _score(gold_triggers, pred_triggers)
+    event_type, per_type = _score(gold_typed, pred_typed, group_col=2)
+    argument, per_role = _score(gold_args, pred_args, group_col=2)
+    event_type["per_type"] = {names[k]: v for k, v in per_type.items()}
+    argument["per_role"] = {names[k]: v for k, v in per_role.items()}
+
+    return {
+        "source": source,
+        "documents": documents,
+        "trigger": trigger,
+        "event_type": event_type,
+        "argument": argument,
+    }
+
+
+def get_scores(db: Session, project_id: int, source: str = SOURCE_CONSENSUS) -> dict:
+    key = (project_id, source)
+    version = stats.data_version(db, project_id)
+    cached = _scores_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    scores = compute_scores(db, project_id, source)
+    if version is not None:
+        _scores_cache.set(key, (version, scores))
+    return scores
@@ -0,0 +1,247 @@
+import json
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, selectinload
+from backend.proj import models, latest, alignment
+from backend.proj.events import parse_events, row_events
+
+SOURCE_TASK = "task"  # LLM output stored on the task
+SOURCE_REVIEW = "review"  # reviewers' latest reviews
+ID_LOOKUP_CHUNK_SIZE = 500  # tasks per SELECT when reading back new event ids
+REINDEX_BATCH_SIZE = 500  # tasks re-indexed per batch by index_project_tasks
+
+
+def _delete(db: Session, *criteria):
+    # Arguments go first: SQLite doesn't enforce ON DELETE CASCADE by default
+    event_ids = select(models.Event.id).where(*criteria)
+    db.query(models.EventArgument).filter(models.EventArgument.event_id.in_(event_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(models.Event).filter(*criteria).delete(synchronize_session=False)
+
+
+def _build(project_id: int, task_id: str, parsed: list[dict], review: models.Review | None = None, article: str | None = None):
+    # (event row, argument rows) per parsed event; with the article, spans get
+    # their offsets into it (or "unmatched") in the rows and in `data`
+    if article is not None:
+        alignment.align_events(article, parsed)
+    events = []
+    for position, event in enumerate(parsed):
+        trigger = event["trigger"]
+        events.append((
+            {
+                "project_id": project_id,
+                "task_id": task_id,
+                "review_id": review.id if review else None,
+                "reviewer_id": review.reviewer_id if review else None,
+                "position": position,
+                "event_type": event["event_type"] or None,
+                "trigger": trigger["text"] or None,
+                "trigger_start": trigger.get("start"),
+                "trigger_end": trigger.get("end"),
+                "data": event,
+            },
+            [
+                {
+                    "project_id": project_id,
+                    "role": arg["role"],
+                    "text": arg["text"],
+                    "start": arg.get("start"),
+                    "end": arg.get("end"),
+                }
+                for arg in event["arguments"]
+            ],
+        ))
+    return events
+
+
+def _insert(db: Session, events: list):
+    # Events go in as one plain executemany: with RETURNING, SQLite runs it as an
+    # INSERT per row. Their ids are then read back, a chunk of tasks per SELECT,
+    # by (task_id, reviewer_id, position), which is unique once _delete has run
+    if not events:
+        return
+    db.execute(models.Event.__table__.insert(), [event for event, _ in events])
+    with_arguments = [(event, arguments) for event, arguments in events if arguments]
+    if not with_arguments:
+        return
+
+    reviewer_ids = {event["reviewer_id"] for event, _ in with_arguments}
+    reviewer_criteria = [models.Event.reviewer_id.in_(reviewer_ids - {None})]
+    if None in reviewer_ids:
+        reviewer_criteria.append(models.Event.reviewer_id.is_(None))
+    task_ids = list({event["task_id"] for event, _ in with_arguments})
+    event_ids = {}
+    for i in range(0, len(task_ids), ID_LOOKUP_CHUNK_SIZE):
+        rows = db.execute(
+            select(models.Event.id, models.Event.task_id, models.Event.reviewer_id, models.Event.position).where(
+                models.Event.task_id.in_(task_ids[i:i + ID_LOOKUP_CHUNK_SIZE]), or_(*reviewer_criteria)
+            )
+        )
+        for event_id, task_id, reviewer_id, position in rows:
+            event_ids[(task_id, reviewer_id, position)] = event_id
+
+    argument_rows = []
+    for event, arguments in with_arguments:
+        event_id = event_ids[(event["task_id"], event["reviewer_id"], event["position"])]
+        for arg in arguments:
+            arg["event_id"] = event_id  # the rows are _build's own, filled in place
+        argument_rows.extend(arguments)
+    db.execute(models.EventArgument.__table__.insert(), argument_rows)
+
+
+def index_tasks(db: Session, tasks: list[dict]):
+    # `tasks` are rows with id/project_id/events, as written by the upload path
+    # (and maybe "parsed", see events.row_events); callers commit
+    if not tasks:
+        return
+    _delete(
+        db,
+        models.Event.task_id.in_([task["id"] for task in tasks]),
+        models.Event.review_id.is_(None),
+    )
+    _insert(db, [
+        event for task in tasks
+        for event in _build(task["project_id"], task["id"], row_events(task), article=task.get("article"))
+    ])
+
+
+def index_task(db: Session, task: models.Task):
+    index_tasks(db, [{"id": task.id, "project_id": task.project_id, "article": task.article, "events": task.events}])
+
+
+def index_project_tasks(db: Session, project_id: int) -> int:
+    # Re-derives the LLM output's rows of every task, a batch at a time; callers commit
+    count = 0
+    tasks = db.query(models.Task.id, models.Task.project_id, models.Task.article, models.Task.events).filter(
+        models.Task.project_id == project_id
+    )
+    batch = []
+    for task in tasks.yield_per(REINDEX_BATCH_SIZE):
+        batch.append(task._asdict())
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            index_tasks(db, batch)
+            count += len(batch)
+            batch = []
+    index_tasks(db, batch)
+    return count + len(batch)
+
+
+def index_reviewer(db: Session, task_id: str, reviewer_id: int, project_id: int):
+    # Re-derives the reviewer's current events for a task from their latest review
+    _delete(db, models.Event.task_id == task_id, models.Event.reviewer_id == reviewer_id)
+    current = db.scalars(
+        latest.current_reviews().where(
+            models.LatestReview.task_id == task_id, models.LatestReview.reviewer_id == reviewer_id
+        )
+    ).first()
+    if current is not None:
+        _insert(db, _build(project_id, task_id, parse_events(current.events), current))
+
+
+def delete_task_events(db: Session, task_id: str):
+    _delete(db, models.Event.task_id == task_id)
+
+
+def delete_project_events(db: Session, project_id: int):
+    _delete(db, models.Event.project_id == project_id)
+
+
+def _span(item: dict) -> dict:
+    return {key: item[key] for key in ("start", "end", "unmatched") if key in item}
+
+
+def task_spans(db: Session, task: models.Task) -> list | None:
+    # Offsets of the LLM output's triggers and arguments as aligned on import,
+    # lined up with the task's stored events: one entry per event, None where
+    # parse_events skipped the event (so it was never stored)
+    try:
+        raw = json.loads(task.events) if task.events else None
+    except ValueError:
+        return None
+    if not isinstance(raw, list):
+        return None
+    stored = iter(
+        db.scalars(
+            select(models.Event.data)
+            .where(models.Event.task_id == task.id, models.Event.review_id.is_(None))
+            .order_by(models.Event.position)
+        ).all()
+    )
+    spans = []
+    for event in raw:
+        data = next(stored, None) if parse_events([event]) else None
+        if data is None:
+            spans.append(None)
+            continue
+        spans.append({
+            "trigger": _span(data["trigger"]),
+            "arguments": [
+                {"role": arg["role"], "text": arg["text"], **_span(arg)} for arg in data["arguments"]
+            ],
+        })
+    return spans
+
+
+def reindex_project(db: Session, project_id: int) -> int:
+    delete_project_events(db, project_id)
+    count = index_project_tasks(db, project_id)
+    pairs = (
+        db.query(models.LatestReview.task_id, models.LatestReview.reviewer_id)
+        .filter(models.LatestReview.project_id == project_id)
+        .all()
+    )
+    for task_id, reviewer_id in pairs:
+        index_reviewer(db, task_id, reviewer_id, project_id)
+    db.commit()
+    return count
+
+
+def query_events(
+    db: Session,
+    project_id: int,
+    source: str = SOURCE_TASK,
+    event_type: str | None = None,
+    trigger: str | None = None,
+    role: str | None = None,
+    argument: str | None = None,
+    reviewer_id: int | None = None,
+    unmatched: bool | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    query = db.query(models.Event).filter(models.Event.project_id == project_id)
+    if source == SOURCE_TASK:
+        query = query.filter(models.Event.review_id.is_(None))
+    else:
+        query = query.filter(models.Event.review_id.is_not(None))
+    if reviewer_id is not None:
+        query = query.filter(models.Event.reviewer_id == reviewer_id)
+    if event_type:
+        query = query.filter(models.Event.event_type == event_type)
+    if trigger:
+        query = query.filter(models.Event.trigger.ilike(f"%{trigger}%"))
+    if role or argument:
+        # "has an argument with this role (and text)" as an index-backed semi-join
+        arg_filter = [models.EventArgument.event_id == models.Event.id]
+        if role:
+            arg_filter.append(models.EventArgument.role == role)
+        if argument:
+            arg_filter.append(models.EventArgument.text.ilike(f"%{argument}%"))
+        query = query.filter(select(models.EventArgument.id).where(*arg_filter).exists())
+    if unmatched is not None:
+        # Spans without offsets: for the LLM output, text that isn't in the article
+        missing = or_(
+            models.Event.trigger_start.is_(None),
+            select(models.EventArgument.id)
+            .where(models.EventArgument.event_id == models.Event.id, models.EventArgument.start.is_(None))
+            .exists(),
+        )
+        query = query.filter(missing if unmatched else ~missing)
+
+    return (
+        query.options(selectinload(models.Event.arguments))
+        .order_by(models.Event.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,98 @@
+import json
+
+# Event types and their argument roles, as listed in the annotation guidelines
+EVENT_ROLES = {
+    "Infect": ["infected", "disease", "place", "time", "value", "information-source"],
+    "Spread": ["population", "disease", "place", "time", "value", "information-source", "trend"],
+    "Symptom": ["person", "symptom", "disease", "place", "time", "duration", "information-source"],
+    "Prevent": ["agent", "disease", "means", "information-source", "target", "effectiveness"],
+    "Control": ["authority", "disease", "means", "place", "time", "information-source", "subject", "effectiveness"],
+    "Cure": ["cured", "disease", "means", "place", "time", "value", "facility", "information-source", "effectiveness", "duration"],
+    "Death": ["dead", "disease", "place", "time", "value", "information-source", "trend"],
+}
+
+
+def normalize_text(text: str) -> str:
+    # Case- and whitespace-insensitive key used to match spans across annotators
+    return " ".join(text.lower().split())
+
+
+def _effective_text(item) -> str:
+    if isinstance(item, str):
+        return item.strip()
+    if not isinstance(item, dict):
+        return ""
+    # Reviewers flag a span as incorrect and type the fix into `correction`
+    if item.get("incorrect") and item.get("correction"):
+        return item["correction"].strip()
+    return (item.get("text") or "").strip()
+
+
+def _offsets(item) -> dict:
+    # Character offsets (see alignment); a corrected span has none
+    if not isinstance(item, dict) or (item.get("incorrect") and item.get("correction")):
+        return {}
+    if item.get("unmatched"):
+        return {"unmatched": True}
+    start, end = item.get("start"), item.get("end")
+    if isinstance(start, int) and isinstance(end, int):
+        return {"start": start, "end": end}
+    return {}
+
+
+def _original_text(item) -> str | None:
+    # The span a correction replaced, if any
+    if isinstance(item, dict) and item.get("incorrect") and item.get("correction"):
+        return (item.get("text") or "").strip() or None
+    return None
+
+
+# Reduce stored task/review events (JSON text or decoded list) to
+# {event_type, trigger: {text}, arguments: [{role, text}]}. Corrections made in
+# the review UI replace the original span (kept under "original"), empty
+# argument slots are dropped and unparseable input yields no events. Offsets
+# ("start"/"end", or "unmatched") are kept on uncorrected spans.
+def parse_events(raw) -> list[dict]:
+    if raw is None:
+        return []
+    if isinstance(raw, (str, bytes)):
+        try:
+            raw = json.loads(raw) if raw.strip() else []
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(raw, list):
+        return []
+
+    events = []
+    for event in raw:
+        if not isinstance(event, dict):
+            continue
+        event_type = (event.get("event_type") or "").strip()
+        trigger = _effective_text(event.get("trigger"))
+        if not trigger and not event_type:
+            continue
+        arguments = []
+        for arg in event.get("arguments") or []:
+            if not isinstance(arg, dict) or not arg.get("role"):
+                continue
+            text = _effective_text(arg)
+            if text:
+                argument = {"role": arg["role"], "text": text, **_offsets(arg)}
+                if _original_text(arg):
+                    argument["original"] = _original_text(arg)
+                arguments.append(argument)
+        parsed_trigger = {"text": trigger, **_offsets(event.get("trigger"))}
+        if _original_text(event.get("trigger")):
+            parsed_trigger["original"] = _original_text(event.get("trigger"))
+        events.append({
+            "event_type": event_type,
+            "trigger": parsed_trigger,
+            "arguments": arguments,
+        })
+    return events
+
+
+# Index rows (id/project_id/article/events) can carry "parsed", their events
+# already run through parse_events, so each derived index doesn't parse again
+def row_events(row: dict) -> list[dict]:
+    return row["parsed"] if "parsed" in row else parse_events(row["events"])
@@ -0,0 +1,75 @@
+from fastapi.responses import Response
+from backend.proj import schemas
+import orjson
+import os
+
+# Set FAST_JSON=0 to fall back to the regular pydantic response path
+ENABLED = os.getenv("FAST_JSON", "1") != "0"
+
+
+class ORJSONBytesResponse(Response):
+    # Body is already encoded; nothing is validated or re-serialized
+    media_type = "application/json"
+
+
+def _events(raw: str | None):
+    # Task.events is written by json.dumps (uploads) or checked to be a JSON list
+    # (CreateTask), so a stored list is spliced into the response as-is instead of
+    # being decoded and re-encoded
+    if raw is None:
+        return None
+    stripped = raw.strip()
+    if stripped.startswith("["):
+        return orjson.Fragment(stripped.encode("utf-8"))
+    # Legacy/odd rows take the validated path (raises like TaskOut would)
+    return schemas.TaskOut.validate_events(raw)
+
+
+def _task(task) -> dict:
+    return {
+        "id": task.id,
+        "project_id": task.project_id,
+        "article": task.article,
+        "events": _events(task.events),
+        "status": getattr(task, "status", None),
+        "spans": getattr(task, "spans", None),
+    }
+
+
+def task_response(task, status_code: int = 200) -> Response:
+    return ORJSONBytesResponse(orjson.dumps(_task(task)), status_code=status_code)
+
+
+def task_list_response(tasks, total: int, next_cursor: str | None = None) -> Response:
+    body = {"tasks": [_task(task) for task in tasks], "total": total, "next_cursor": next_cursor}
+    return ORJSONBytesResponse(orjson.dumps(body))
+
+
+def task_summary_list_response(tasks, total: int, next_cursor: str | None = None) -> Response:
+    body = {
+        "tasks": [
+            {
+                "id": task.id,
+                "project_id": task.project_id,
+                "snippet": task.snippet,
+                "event_count": task.event_count,
+                "status": getattr(task, "status", None),
+            }
+            for task in tasks
+        ],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+    return ORJSONBytesResponse(orjson.dumps(body))
+
+
+def review_response(review, status_code: int = 200) -> Response:
+    # Review events are a client-supplied JSON string in the API, so they stay a string
+    body = {
+        "id": review.id,
+        "task_id": review.task_id,
+        "reviewer_id": review.reviewer_id,
+        "events": review.events,
+        "comment": review.comment,
+    }
+    return ORJSONBytesResponse(orjson.dumps(body), status_code=status_code)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from backend.proj import models
+import json
+import os
+
+# How long a key is remembered; clients replaying later than this write again
+KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "72"))
+
+
+class KeyReused(ValueError):
+    # The key was already used for a different request body
+    pass
+
+
+def lookup(db: Session, user_id: int, key: str, request_hash: str) -> dict | None:
+    row = db.get(models.IdempotencyKey, (user_id, key))
+    if row is None or row.created_at < datetime.utcnow() - timedelta(hours=KEY_TTL_HOURS):
+        return None
+    if row.request_hash != request_hash:
+        raise KeyReused("Idempotency-Key was already used for a different request")
+    return json.loads(row.response)
+
+
+def store(db: Session, user_id: int, key: str, project_id: int, request_hash: str, response: dict):
+    # Written in the caller's transaction, so the key exists exactly when the writes do
+    cutoff = datetime.utcnow() - timedelta(hours=KEY_TTL_HOURS)
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.created_at < cutoff,
+    ).delete(synchronize_session=False)
+    db.add(models.IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        project_id=project_id,
+        request_hash=request_hash,
+        response=json.dumps(response),
+    ))
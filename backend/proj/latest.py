@@ -0,0 +1,86 @@
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from backend.proj import models
+
+# Newest first; the id breaks ties between reviews sharing a created_at
+NEWEST_FIRST = (models.Review.created_at.desc(), models.Review.id.desc())
+
+
+def current_reviews(project_id: int | None = None):
+    # select(Review) limited to current reviews, optionally of one project
+    query = select(models.Review).join(models.LatestReview, models.LatestReview.review_id == models.Review.id)
+    if project_id is not None:
+        query = query.where(models.LatestReview.project_id == project_id)
+    return query
+
+
+def set_current(db: Session, review: models.Review, project_id: int):
+    # A review just written is its reviewer's newest; callers commit
+    row = db.get(models.LatestReview, (review.task_id, review.reviewer_id))
+    if row is None:
+        db.add(models.LatestReview(
+            task_id=review.task_id, reviewer_id=review.reviewer_id, review_id=review.id, project_id=project_id
+        ))
+    else:
+        row.review_id = review.id
+        row.project_id = project_id
+    db.flush()
+
+
+def refresh(db: Session, task_id: str, reviewer_id: int, project_id: int):
+    # Re-points (or drops) the pointer after an update or delete
+    latest = (
+        db.query(models.Review)
+        .filter(models.Review.task_id == task_id, models.Review.reviewer_id == reviewer_id)
+        .order_by(*NEWEST_FIRST)
+        .first()
+    )
+    if latest is not None:
+        set_current(db, latest, project_id)
+        return
+    db.query(models.LatestReview).filter(
+        models.LatestReview.task_id == task_id, models.LatestReview.reviewer_id == reviewer_id
+    ).delete(synchronize_session=False)
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    db.query(models.LatestReview).filter(models.LatestReview.task_id.in_(task_ids)).delete(synchronize_session=False)
+
+
+def delete_project(db: Session, project_id: int):
+    db.query(models.LatestReview).filter(models.LatestReview.project_id == project_id).delete(synchronize_session=False)
+
+
+def _insert_ranked(db: Session, project_id: int | None = None) -> int:
+    # The one place that still ranks the review history, as a single INSERT ... SELECT
+    rank = func.row_number().over(
+        partition_by=(models.Review.task_id, models.Review.reviewer_id), order_by=NEWEST_FIRST
+    )
+    ranked = (
+        select(models.Review.id, models.Review.task_id, models.Review.reviewer_id, models.Task.project_id, rank.label("rank"))
+        .join(models.Task, models.Task.id == models.Review.task_id)
+    )
+    if project_id is not None:
+        ranked = ranked.where(models.Task.project_id == project_id)
+    ranked = ranked.subquery()
+    result = db.execute(
+        insert(models.LatestReview).from_select(
+            ["review_id", "task_id", "reviewer_id", "project_id"],
+            select(ranked.c.id, ranked.c.task_id, ranked.c.reviewer_id, ranked.c.project_id).where(ranked.c.rank == 1),
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_project(db: Session, project_id: int) -> int:
+    delete_project(db, project_id)
+    count = _insert_ranked(db, project_id)
+    db.commit()
+    return count
+
+
+def backfill(db: Session):
+    # Databases with reviews from before the table existed are filled once at startup
+    if db.query(models.LatestReview.task_id).first() is None and db.query(models.Review.id).first() is not None:
+        _insert_ranked(db)
+        db.commit()
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, ForeignKey, JSON, Float, BigInteger, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
 from backend.database import Base
 from datetime import datetime
 
@@ -22,8 +24,13 @@ class Task(Base):
     events = Column(String, nullable=True) # JSON string to store events
     created_at = Column(DateTime, default=datetime.utcnow)
     modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
- 
-    
+
+    __table_args__ = (
+        # Backs keyset pagination of a project's tasks
+        Index("ix_tasks_project_id_id", "project_id", "id"),
+    )
+
+
 class Review(Base):
     __tablename__ = "reviews"
     
@@ -34,3 +41,216 @@ class Review(Base):
     comment = Column(String, nullable=True)  # Optional field for reviewer comments
     created_at = Column(DateTime, default=datetime.utcnow)
     modified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Backs the per-reviewer "reviewed" semi-join on task listings
+        Index("ix_reviews_reviewer_id_task_id", "reviewer_id", "task_id"),
+    )
+
+
+class Consensus(Base):
+    __tablename__ = "consensus"
+
+    task_id = Column(String, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)  # pending | agreed | adjudication
+    num_reviews = Column(Integer, default=0)  # reviewers whose latest review was counted
+    events = Column(String, nullable=True)  # JSON string of majority-agreed events
+    disputes = Column(String, nullable=True)  # JSON string of items without a majority
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Backs the per-project adjudication queue
+        Index("ix_consensus_project_id_status", "project_id", "status"),
+    )
+
+
+class ReviewDiff(Base):
+    __tablename__ = "review_diffs"
+
+    id = Column(Integer, primary_key=True)
+    review_id = Column(Integer, nullable=False, index=True)
+    task_id = Column(String, nullable=False)
+    project_id = Column(Integer, nullable=False)
+    reviewer_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # trigger | event_type | argument
+    action = Column(String, nullable=False)  # kept | edited | role | added | removed
+    event_type = Column(String, nullable=True)
+    role = Column(String, nullable=True)  # argument rows only
+    current = Column(Boolean, default=True)  # False once the reviewer re-reviews the task
+
+    __table_args__ = (
+        # Correction stats aggregate a project's current rows
+        Index("ix_review_diffs_project_id_current", "project_id", "current"),
+        Index("ix_review_diffs_task_id_reviewer_id", "task_id", "reviewer_id"),
+    )
+
+
+class Event(Base):
+    # Normalized copy of the events in Task.events (review_id NULL) and in each
+    # reviewer's latest review, so they can be filtered in the database
+    __tablename__ = "events"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    task_id = Column(String, nullable=False)
+    review_id = Column(Integer, nullable=True)  # NULL for the LLM output
+    reviewer_id = Column(Integer, nullable=True)
+    position = Column(Integer, nullable=False)  # index in the source event list
+    event_type = Column(String, nullable=True)
+    trigger = Column(String, nullable=True)
+    trigger_start = Column(Integer, nullable=True)  # character offsets into Task.article
+    trigger_end = Column(Integer, nullable=True)
+    data = Column(JSON().with_variant(JSONB, "postgresql"))  # the event as stored
+
+    arguments = relationship(
+        "EventArgument", back_populates="event", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    __table_args__ = (
+        Index("ix_events_project_id_event_type", "project_id", "event_type"),
+        Index("ix_events_task_id_reviewer_id", "task_id", "reviewer_id"),
+    )
+
+
+class EventArgument(Base):
+    __tablename__ = "event_arguments"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    project_id = Column(Integer, nullable=False)
+    role = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    start = Column(Integer, nullable=True)  # character offsets into Task.article
+    end = Column(Integer, nullable=True)
+
+    event = relationship("Event", back_populates="arguments")
+
+    __table_args__ = (
+        Index("ix_event_arguments_project_id_role", "project_id", "role"),
+    )
+
+
+class TaskQueue(Base):
+    # One row per task: how many reviewer slots are taken (finished reviews plus
+    # open leases) against the number of annotators the task should get
+    __tablename__ = "task_queue"
+
+    task_id = Column(String, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    assigned = Column(Integer, nullable=False, default=0)
+    quota = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Least-assigned task first: the next task is the head of this index
+        Index("ix_task_queue_project_id_assigned_task_id", "project_id", "assigned", "task_id"),
+    )
+
+
+class TaskLease(Base):
+    # A task handed to a reviewer who hasn't submitted yet; holds one slot until it expires
+    __tablename__ = "task_leases"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(String, nullable=False)
+    project_id = Column(Integer, nullable=False)
+    reviewer_id = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_task_leases_task_id_reviewer_id", "task_id", "reviewer_id", unique=True),
+        Index("ix_task_leases_project_id_expires_at", "project_id", "expires_at"),
+        Index("ix_task_leases_project_id_reviewer_id", "project_id", "reviewer_id"),
+    )
+
+
+class ProjectStats(Base):
+    # Progress counters kept up to date by the task and review writes
+    __tablename__ = "project_stats"
+
+    project_id = Column(Integer, primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    reviewed_tasks = Column(Integer, nullable=False, default=0)  # at least one reviewer
+    completed_tasks = Column(Integer, nullable=False, default=0)  # as many reviewers as the task's quota, or more
+    reviews = Column(Integer, nullable=False, default=0)
+    # Bumped by every write the project's cached listings and reports depend on,
+    # so caches in any worker can tell their entries are stale
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReviewerStats(Base):
+    __tablename__ = "reviewer_stats"
+
+    project_id = Column(Integer, primary_key=True)
+    reviewer_id = Column(Integer, primary_key=True)
+    reviews = Column(Integer, nullable=False, default=0)
+    tasks = Column(Integer, nullable=False, default=0)  # distinct tasks reviewed
+
+
+class IdempotencyKey(Base):
+    # Result of a keyed batch request, so a replay returns it instead of writing again
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    request_hash = Column(String, nullable=False)  # sha256 of the request body
+    response = Column(String, nullable=False)  # JSON string of the stored result
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LatestReview(Base):
+    # Each reviewer's current review of a task (newest created_at, then id), kept
+    # by the review writes so readers join on it instead of ranking the history
+    __tablename__ = "latest_reviews"
+
+    task_id = Column(String, primary_key=True)
+    reviewer_id = Column(Integer, primary_key=True)
+    review_id = Column(Integer, nullable=False, unique=True)
+    project_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_latest_reviews_project_id_task_id", "project_id", "task_id"),
+    )
+
+
+class TaskFingerprint(Base):
+    # Dedup index entry per stored task: a hash of the normalized article for
+    # exact copies and a MinHash signature for near-duplicates (see dedup)
+    __tablename__ = "task_fingerprints"
+
+    task_id = Column(String, primary_key=True)
+    project_id = Column(Integer, nullable=False, index=True)
+    content_hash = Column(String, nullable=False, index=True)
+    signature = Column(LargeBinary, nullable=False)
+    duplicate_of = Column(String, nullable=True, index=True)  # canonical task, when flagged as a copy
+    similarity = Column(Float, nullable=True)  # estimated Jaccard with duplicate_of
+    exact = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TaskLshBucket(Base):
+    # LSH bands of the canonical tasks' signatures: near-duplicate candidates
+    # are the tasks sharing any bucket, found by primary-key lookups. The band
+    # number is hashed into the bucket, so one column is the whole key
+    __tablename__ = "task_lsh_buckets"
+
+    bucket = Column(BigInteger, primary_key=True)
+    task_id = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_task_lsh_buckets_task_id", "task_id"),
+    )
+
+
+class TaskAlias(Base):
+    # An uploaded row that was linked to an existing task instead of stored
+    __tablename__ = "task_aliases"
+
+    alias_id = Column(String, primary_key=True)  # id the row was uploaded with
+    project_id = Column(Integer, nullable=False, index=True)
+    task_id = Column(String, nullable=False, index=True)
+    similarity = Column(Float, nullable=False)
+    exact = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.proj import schemas, crud, models
-from backend.database import SessionLocal
+from backend.proj import schemas, crud, models, consensus, evaluation, agreement, diffs, event_store, fastjson, search, assignment, stats, idempotency, latest, columnar, dedup
+from backend.database import SessionLocal, ReadSessionLocal, get_async_db, get_async_read_db
 from backend.auth.routes import get_current_user
 from backend.auth.models import User
 
-import os
 
 router = APIRouter(prefix="/projects")
 
+# Interactive routes are async and share the crud functions through
+# `db.run_sync`; bulk upload/export stay sync so their CPU work runs in the threadpool
 def get_db():
     db = SessionLocal()
     try:
@@ -17,85 +21,199 @@ def get_db():
     finally:
         db.close()
 
+# Read-only routes; served by READ_DATABASE_URL when it is set
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @router.get("", response_model=list[schemas.ProjectOut])
-def get_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    projects = crud.get_projects(db, owner_id=current_user.id, skip=skip, limit=limit)
+async def get_projects(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    projects = await db.run_sync(crud.get_projects, owner_id=current_user.id, skip=skip, limit=limit)
     return projects
 
 @router.post("", response_model=schemas.ProjectOut, status_code=status.HTTP_201_CREATED)
-def create_project(project: schemas.CreateProject, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return crud.create_project(db, project, owner_id=current_user.id)
+async def create_project(project: schemas.CreateProject, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    return await db.run_sync(crud.create_project, project, owner_id=current_user.id)
 
 @router.get("/{project_id}", response_model=schemas.ProjectOut)
-def get_project(project_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = crud.get_project(db, project_id)
+async def get_project(project_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    project = await db.run_sync(crud.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.put("/{project_id}", response_model=schemas.ProjectOut)
-def update_project(
+async def update_project(
     project_id: int,
     project: schemas.CreateProject,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    updated_project = crud.update_project(db, project_id, project)
+    updated_project = await db.run_sync(crud.update_project, project_id, project)
     if not updated_project:
         raise HTTPException(status_code=404, detail="Project not found")
     return updated_project
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(
+async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    deleted_project = crud.delete_project(db, project_id)
+    deleted_project = await db.run_sync(crud.delete_project, project_id)
     if not deleted_project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-@router.get("/{project_id}/export", response_class=FileResponse)
-def export_review(
+@router.get("/{project_id}/stats", response_model=schemas.ProjectStatsOut)
+async def get_project_stats(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    project_stats = await db.run_sync(stats.get_project_stats, project_id)
+    if project_stats is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project_stats
+
+@router.post("/{project_id}/stats/rebuild", response_model=schemas.ProjectStatsOut)
+def rebuild_project_stats(
     project_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    tasks = crud.get_tasks(db, project_id=project_id)
-    if not tasks:
+    if not crud.get_project(db, project_id=project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    stats.rebuild_project_stats(db, project_id)
+    return stats.get_project_stats(db, project_id)
+
+@router.get("/{project_id}/export", response_class=StreamingResponse)
+def export_review(
+    project_id: int,
+    gzip: bool = Query(False),  # Compress the stream on the fly
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not crud.project_has_tasks(db, project_id=project_id):
         raise HTTPException(status_code=404, detail="No tasks found for this project")
-    
-    file_path = crud.export_tasks_to_jsonl(db, project_id=project_id)
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=500, detail="Failed to export tasks to JSONL")
-
-    return FileResponse(
-        path=file_path,
-        filename=f"project_{project_id}_reviews.jsonl",
-        media_type="application/jsonl"
+
+    # NDJSON goes out as it is read, so nothing is materialized or written to disk
+    filename = f"project_{project_id}_reviews.jsonl"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}{".gz" if gzip else ""}"'}
+    return StreamingResponse(
+        crud.stream_export_jsonl(project_id=project_id, compress=gzip),
+        media_type="application/gzip" if gzip else "application/jsonl",
+        headers=headers,
     )
 
-    
+@router.get("/{project_id}/export/{table}", response_class=StreamingResponse)
+def export_columnar(
+    project_id: int,
+    table: Literal["tasks", "events", "arguments", "reviews"],
+    format: Literal["parquet", "arrow"] = Query("parquet"),
+    columns: str | None = Query(None),  # Comma-separated projection
+    since: datetime | None = Query(None),  # Only rows of tasks/reviews modified since
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not columnar.available():
+        raise HTTPException(status_code=501, detail="Columnar export needs pyarrow installed")
+    if not crud.project_has_tasks(db, project_id=project_id):
+        raise HTTPException(status_code=404, detail="No tasks found for this project")
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    try:
+        columnar.schema(table, selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Written a row group at a time, like the JSONL export
+    media_type, extension = columnar.FORMATS[format]
+    filename = f"project_{project_id}_{table}.{extension}"
+    return StreamingResponse(
+        columnar.stream_export(project_id, table, format, selected, since),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-@router.get("/{project_id}/tasks", response_model=schemas.TaskListOut)
-def get_tasks(
+@router.get("/{project_id}/tasks", response_model=schemas.TaskListOut | schemas.TaskSummaryListOut)
+async def get_tasks(
     project_id: int,
     skip: int = 0,
     limit: int = 100,
     status: bool | None = Query(None),  # Optional filter
-    db: Session = Depends(get_db),
+    after: str | None = Query(None),  # Keyset cursor: last task id of the previous page
+    # summary: snippet and event count instead of the article and events, which
+    # only GET /tasks/{task_id} then loads
+    view: Literal["full", "summary"] = Query("full"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    tasks, total = crud.get_tasks_with_total(
-        db, current_user.id, project_id=project_id, skip=skip, limit=limit, status=status
+    summary = view == "summary"
+    tasks, total, next_cursor = await db.run_sync(
+        crud.get_tasks_with_total,
+        current_user.id, project_id=project_id, skip=skip, limit=limit, status=status, after=after, summary=summary
     )
-    return {"tasks": tasks, "total": total}
+    if summary:
+        if fastjson.ENABLED:
+            return fastjson.task_summary_list_response(tasks, total, next_cursor)
+        return schemas.TaskSummaryListOut(
+            tasks=[schemas.TaskSummaryOut.model_validate(task) for task in tasks], total=total, next_cursor=next_cursor
+        )
+    if fastjson.ENABLED:
+        return fastjson.task_list_response(tasks, total, next_cursor)
+    return {"tasks": tasks, "total": total, "next_cursor": next_cursor}
+
+# Declared before /tasks/{task_id} so "next" isn't taken for a task id
+@router.get("/{project_id}/tasks/next", response_model=schemas.TaskAssignmentOut)
+async def get_next_task(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    claimed = await db.run_sync(assignment.claim_next, project_id, current_user.id)
+    if claimed is None:
+        raise HTTPException(status_code=404, detail="No task available")
+    task, lease, entry = claimed
+    return {"task": task, "lease_expires_at": lease.expires_at, "assigned": entry.assigned, "quota": entry.quota}
+
+@router.post("/{project_id}/tasks/queue/rebuild", response_model=schemas.ReindexOut)
+def rebuild_task_queue(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return {"tasks": assignment.rebuild_queue(db, project_id)}
+
+# Declared before /tasks/{task_id} so "search" isn't taken for a task id
+@router.get("/{project_id}/tasks/search", response_model=schemas.SearchResultsOut)
+async def search_tasks(
+    project_id: int,
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(20, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    results, total = await db.run_sync(search.search_tasks, project_id, q, skip=skip, limit=limit)
+    return {"results": results, "total": total}
+
+@router.post("/{project_id}/tasks/search/reindex", response_model=schemas.ReindexOut)
+def reindex_search(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return {"tasks": search.reindex_project(db, project_id)}
 
 @router.get("/{project_id}/tasks/{task_id}", response_model=schemas.TaskOut)
-def get_task(project_id: int, task_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = crud.get_task(db, task_id=task_id)
+async def get_task(project_id: int, task_id: str, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    task = await db.run_sync(crud.get_task_detail, task_id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if fastjson.ENABLED:
+        return fastjson.task_response(task)
     return task
 
 @router.post(
@@ -106,20 +224,29 @@ def get_task(project_id: int, task_id: str, db: Session = Depends(get_db), curre
 def upload_task_file(
     project_id: int,
     file: UploadFile = File(...),  # ✅ Accept actual uploaded file from form
+    duplicates: Literal["flag", "skip", "link"] = Query(dedup.FLAG),  # What to do with copies of stored articles
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    task = crud.create_task_from_file(db, project_id=project_id, file=file.file)
+    # Parsed straight off the upload spool in chunks; rows are upserted in batches
+    task = crud.create_task_from_file(
+        db, project_id=project_id, file=file.file, filename=file.filename, duplicates=duplicates
+    )
 
     if not task:
         raise HTTPException(status_code=400, detail="Failed to create task from file")
 
     return schemas.UploadFileResponse(
         content_type=task.get("content_type", "application/json"),  # Default to 'application/json'
-        size=task.get('size', 0),  # Assuming `task` has a size attribute
+        size=task.get('size', 0),
+        failed=task.get('failed', 0),
+        errors=task.get('errors', []),
+        skipped=task.get('skipped', 0),
+        linked=task.get('linked', 0),
+        flagged=task.get('flagged', 0),
     )
 
 
@@ -128,19 +255,204 @@ def upload_task_file(
     response_model=schemas.ReviewOut,
     status_code=status.HTTP_201_CREATED,  
 )
-def create_review(
+async def create_review(
     project_id: int,
     task_id: str,
     review: schemas.CreateReview,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     # Ensure the task exists
-    task = crud.get_task(db, task_id=task_id)
+    task = await db.run_sync(crud.get_task, task_id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     # Create the review
-    review = crud.create_review(db, review, task_id=task_id, reviewer_id=current_user.id)
+    review = await db.run_sync(crud.create_review, review, task_id=task_id, reviewer_id=current_user.id)
+    if review is None:  # deleted in the meantime
+        raise HTTPException(status_code=404, detail="Task not found")
+    if fastjson.ENABLED:
+        return fastjson.review_response(review, status_code=status.HTTP_201_CREATED)
     return review
 
+@router.post("/{project_id}/reviews:batch", response_model=schemas.ReviewBatchOut)
+async def create_reviews_batch(
+    project_id: int,
+    batch: schemas.ReviewBatchIn,
+    idempotency_key: str | None = Header(None, max_length=200),  # Replays with the same key return the first result
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    try:
+        return await db.run_sync(
+            crud.create_reviews_batch, project_id, batch.reviews, current_user.id, idempotency_key
+        )
+    except idempotency.KeyReused as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/{project_id}/consensus", response_model=list[schemas.ConsensusOut])
+async def get_project_consensus(
+    project_id: int,
+    status: str | None = Query(None),  # pending | agreed | adjudication
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    return await db.run_sync(
+        consensus.get_project_consensus, project_id, status=status, skip=skip, limit=limit
+    )
+
+@router.get("/{project_id}/adjudication", response_model=list[schemas.ConsensusOut])
+async def get_adjudication_queue(
+    project_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    return await db.run_sync(
+        consensus.get_project_consensus,
+        project_id, status=consensus.STATUS_ADJUDICATION, skip=skip, limit=limit,
+    )
+
+@router.post("/{project_id}/consensus/rebuild", response_model=schemas.ConsensusRebuildOut)
+def rebuild_project_consensus(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    rebuilt = consensus.rebuild_project_consensus(db, project_id)
+    stats.touch(db, project_id)
+    db.commit()
+    crud.invalidate_review_reports(project_id)
+    return {"tasks": rebuilt}
+
+@router.get("/{project_id}/tasks/{task_id}/consensus", response_model=schemas.ConsensusOut)
+async def get_task_consensus(
+    project_id: int,
+    task_id: str,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    result = await db.run_sync(consensus.get_consensus, task_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="No consensus for this task")
+    return result
+
+@router.get("/{project_id}/metrics", response_model=schemas.MetricsOut)
+def get_project_metrics(
+    project_id: int,
+    source: Literal["consensus", "reviews"] = Query(evaluation.SOURCE_CONSENSUS),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Sync on purpose: scoring is CPU-bound and belongs in the threadpool
+    return evaluation.get_scores(db, project_id, source=source)
+
+@router.get("/{project_id}/agreement", response_model=schemas.AgreementOut)
+def get_project_agreement(
+    project_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Tasks are scored in chunks across a process pool; see agreement.AGREEMENT_WORKERS
+    return agreement.get_agreement(db, project_id)
+
+@router.get("/{project_id}/corrections", response_model=schemas.CorrectionStatsOut)
+async def get_correction_stats(
+    project_id: int,
+    top: int = Query(10, le=100),  # Most frequent error types to list
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Diffs are computed when reviews are written, so this is only aggregates
+    return await db.run_sync(diffs.correction_stats, project_id, top=top)
+
+@router.post("/{project_id}/corrections/rebuild", response_model=schemas.RebuildOut)
+def rebuild_correction_stats(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return {"reviews": diffs.rebuild_project_diffs(db, project_id)}
+
+@router.post("/{project_id}/reviews/latest/rebuild", response_model=schemas.RebuildOut)
+def rebuild_latest_reviews(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Re-derives the latest-review pointers from the review history
+    rebuilt = latest.rebuild_project(db, project_id)
+    stats.touch(db, project_id)
+    db.commit()
+    crud.invalidate_task_totals(project_id)
+    crud.invalidate_review_reports(project_id)
+    return {"reviews": rebuilt}
+
+@router.get("/{project_id}/events", response_model=list[schemas.EventOut])
+async def query_events(
+    project_id: int,
+    source: Literal["task", "review"] = Query(event_store.SOURCE_TASK),
+    event_type: str | None = Query(None),  # e.g. Death
+    trigger: str | None = Query(None),  # substring of the trigger
+    role: str | None = Query(None),  # has an argument with this role, e.g. value
+    argument: str | None = Query(None),  # substring of an argument span
+    reviewer_id: int | None = Query(None),
+    unmatched: bool | None = Query(None),  # has spans not found in the article (true) or none (false)
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    return await db.run_sync(
+        event_store.query_events,
+        project_id,
+        source=source,
+        event_type=event_type,
+        trigger=trigger,
+        role=role,
+        argument=argument,
+        reviewer_id=reviewer_id,
+        unmatched=unmatched,
+        skip=skip,
+        limit=limit,
+    )
+
+@router.get("/{project_id}/duplicates", response_model=schemas.DuplicateReportOut)
+async def get_duplicates(
+    project_id: int,
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Copies found at import, against tasks of any project
+    return await db.run_sync(dedup.duplicate_report, project_id, skip=skip, limit=limit)
+
+@router.post("/{project_id}/duplicates/rebuild", response_model=schemas.ReindexOut)
+def rebuild_duplicates(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Fingerprints tasks imported before the dedup index existed; copies are flagged
+    return {"tasks": dedup.rebuild_project(db, project_id)}
+
+@router.post("/{project_id}/tasks/alignment/rebuild", response_model=schemas.ReindexOut)
+def realign_tasks(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Recomputes the span offsets of the LLM output in the event store
+    return {"tasks": crud.realign_project_tasks(db, project_id)}
+
+@router.post("/{project_id}/events/reindex", response_model=schemas.ReindexOut)
+def reindex_events(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return {"tasks": event_store.reindex_project(db, project_id)}
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
+from datetime import datetime
 import json
+import os
 
 class CreateProject(BaseModel):
     name: str
@@ -20,6 +22,21 @@ class CreateTask(BaseModel):
     article: str
     events: str | None = None # JSON string to store events
 
+    @field_validator("events")
+    @classmethod
+    def validate_events(cls, v):
+        # Stored text is spliced into task responses as-is (see fastjson), so it
+        # must be a JSON list
+        if v is None or not v.strip():
+            return None
+        try:
+            events = json.loads(v)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON string for events")
+        if not isinstance(events, list):
+            raise ValueError("events must be a JSON list")
+        return v.strip()
+
 class CreateReview(BaseModel):
     events: str | None = None  # JSON string to store events
     comment: str | None = None  # Optional field for reviewer comments
@@ -43,9 +60,19 @@ class UploadFile(BaseModel):
         from_attributes = True
         arbitrary_types_allowed = True  # Allow bytes as a type
 
+class UploadRowError(BaseModel):
+    line: int  # Line number in the uploaded file
+    id: str | None = None
+    error: str
+
 class UploadFileResponse(BaseModel):
     content_type: str
-    size: int  # Size of the uploaded file in bytes
+    size: int  # Number of tasks imported
+    failed: int = 0  # Number of rows rejected
+    errors: List[UploadRowError] = []  # First rejected rows, for display
+    skipped: int = 0  # Duplicates not stored (duplicates=skip)
+    linked: int = 0  # Duplicates recorded as aliases of an existing task (duplicates=link)
+    flagged: int = 0  # Duplicates stored and marked (duplicates=flag)
 
 
 class TaskOut(BaseModel):
@@ -54,6 +81,9 @@ class TaskOut(BaseModel):
     article: str
     events: list | None = None  # JSON string to store events
     status: bool | None = None
+    # Task detail only: per event, its trigger/argument offsets into the article
+    # ("start"/"end", or "unmatched"), None for events that couldn't be parsed
+    spans: list | None = None
     
     @field_validator("events", mode="before")
     @classmethod
@@ -72,6 +102,23 @@ class TaskOut(BaseModel):
 class TaskListOut(BaseModel):
     tasks: List[TaskOut]
     total: int
+    next_cursor: str | None = None  # Pass as `after` to fetch the next page
+
+class TaskSummaryOut(BaseModel):
+    # A task list row without the article and events (view=summary)
+    id: str
+    project_id: int
+    snippet: str | None = None  # Start of the article, cut at a word boundary
+    event_count: int = 0  # Events in the LLM output
+    status: bool | None = None
+
+    class Config:
+        from_attributes = True
+
+class TaskSummaryListOut(BaseModel):
+    tasks: List[TaskSummaryOut]
+    total: int
+    next_cursor: str | None = None
     
 class DonwloadFileResponse(BaseModel):
     filename: str
@@ -79,4 +126,192 @@ class DonwloadFileResponse(BaseModel):
 
     class Config:
         from_attributes = True
-        arbitrary_types_allowed = True  # Allow bytes as a type
\ No newline at end of file
+        arbitrary_types_allowed = True  # Allow bytes as a type
+
+class ConsensusOut(BaseModel):
+    task_id: str
+    project_id: int
+    status: str  # pending | agreed | adjudication
+    num_reviews: int
+    events: list | None = None
+    disputes: list | None = None
+
+    @field_validator("events", "disputes", mode="before")
+    @classmethod
+    def validate_json(cls, v):
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
+
+    class Config:
+        from_attributes = True
+
+class ConsensusRebuildOut(BaseModel):
+    tasks: int  # Tasks re-voted
+
+class Scores(BaseModel):
+    precision: float
+    recall: float
+    f1: float
+    tp: int | None = None
+    fp: int | None = None
+    fn: int | None = None
+
+class LevelScores(BaseModel):
+    micro: Scores
+    macro: Scores | None = None  # Unweighted mean over event types / roles
+
+class EventTypeScores(LevelScores):
+    per_type: dict[str, Scores] = {}
+
+class ArgumentScores(LevelScores):
+    per_role: dict[str, Scores] = {}
+
+class MetricsOut(BaseModel):
+    source: str  # consensus | reviews
+    documents: int  # (task, reference) pairs scored
+    trigger: LevelScores
+    event_type: EventTypeScores
+    argument: ArgumentScores
+
+class PairKappa(BaseModel):
+    reviewer_a: int
+    reviewer_b: int
+    items: int  # Items either reviewer annotated on tasks both reviewed
+    kappa: float | None = None
+    per_type: dict[str, float | None] | None = None
+    per_role: dict[str, float | None] | None = None
+
+class FleissKappa(BaseModel):
+    items: int
+    kappa: float | None = None
+    per_type: dict[str, float | None] | None = None
+    per_role: dict[str, float | None] | None = None
+
+class KappaReport(BaseModel):
+    cohen: List[PairKappa]
+    fleiss: FleissKappa
+
+class SpanOverlap(BaseModel):
+    pairs: int  # Reviewer pairs compared
+    dice: float | None = None
+    jaccard: float | None = None
+
+class AgreementOut(BaseModel):
+    tasks: int  # Tasks with at least two reviewers
+    event_type: KappaReport
+    role: KappaReport
+    span: dict[str, SpanOverlap]  # char | token
+
+class CorrectionBreakdown(BaseModel):
+    total: int
+    counts: dict[str, int]  # action -> items
+    percent: dict[str, float]  # action -> % of items of this kind
+
+class CorrectionError(BaseModel):
+    kind: str  # trigger | event_type | argument
+    action: str  # edited | role | added | removed
+    event_type: str | None = None
+    role: str | None = None
+    count: int
+
+class CorrectionStatsOut(BaseModel):
+    items: dict[str, CorrectionBreakdown]  # keyed by kind
+    top_errors: List[CorrectionError]
+
+class RebuildOut(BaseModel):
+    reviews: int  # Reviews re-diffed
+
+class EventArgumentOut(BaseModel):
+    role: str
+    text: str
+    start: int | None = None
+    end: int | None = None
+
+    class Config:
+        from_attributes = True
+
+class EventOut(BaseModel):
+    id: int
+    task_id: str
+    review_id: int | None = None  # None for the LLM output
+    reviewer_id: int | None = None
+    event_type: str | None = None
+    trigger: str | None = None
+    trigger_start: int | None = None
+    trigger_end: int | None = None
+    arguments: List[EventArgumentOut] = []
+
+    class Config:
+        from_attributes = True
+
+class ReindexOut(BaseModel):
+    tasks: int  # Tasks re-indexed
+
+class SearchHit(BaseModel):
+    task_id: str
+    score: float  # Higher is more relevant
+    snippet: str | None = None  # Article excerpt with matches in [brackets]
+
+class SearchResultsOut(BaseModel):
+    results: List[SearchHit]
+    total: int
+
+class TaskAssignmentOut(BaseModel):
+    task: TaskOut
+    lease_expires_at: datetime  # Submit a review before this or the task goes back in the queue
+    assigned: int  # Reviewer slots taken: finished reviews plus open leases
+    quota: int  # Annotators the task should get
+
+class ReviewerStatsOut(BaseModel):
+    reviewer_id: int
+    reviews: int
+    tasks: int  # Distinct tasks reviewed
+
+    class Config:
+        from_attributes = True
+
+class ProjectStatsOut(BaseModel):
+    project_id: int
+    tasks: int
+    reviewed_tasks: int  # Tasks with at least one review
+    completed_tasks: int  # Tasks with at least `annotators_per_task` reviewers
+    annotators_per_task: int
+    reviews: int
+    reviewers: List[ReviewerStatsOut]
+    updated_at: datetime | None = None
+
+REVIEW_BATCH_MAX = int(os.getenv("REVIEW_BATCH_MAX", "500"))  # reviews per batch request
+
+class ReviewBatchItem(CreateReview):
+    task_id: str
+
+class ReviewBatchIn(BaseModel):
+    reviews: List[ReviewBatchItem] = Field(..., min_length=1, max_length=REVIEW_BATCH_MAX)
+
+class ReviewBatchResult(BaseModel):
+    index: int  # Position in the submitted batch
+    task_id: str
+    status: str  # created | failed
+    review_id: int | None = None
+    error: str | None = None
+
+class ReviewBatchOut(BaseModel):
+    results: List[ReviewBatchResult]
+    created: int
+    failed: int
+    replayed: bool = False  # True when answered from a stored Idempotency-Key result
+
+class DuplicateOut(BaseModel):
+    task_id: str  # The copy: a stored task, or the id a linked row was uploaded with
+    duplicate_of: str  # Canonical task
+    duplicate_project_id: int | None = None  # Project of the canonical task
+    similarity: float  # Estimated Jaccard similarity, 1.0 for exact copies
+    exact: bool
+    linked: bool  # True when the copy wasn't stored
+
+class DuplicateReportOut(BaseModel):
+    project_id: int
+    flagged: int
+    linked: int
+    duplicates: List[DuplicateOut]
@@ -0,0 +1,226 @@
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from backend.proj import models
+from backend.proj.events import row_events
+import os
+import re
+
+# Postgres text search configuration used for both documents and queries
+TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "english")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# SQLite: FTS5 over an external-content table, so documents can be replaced by
+# task id through an ordinary unique index; triggers keep the FTS index in step
+_SQLITE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_search_docs (
+        rowid INTEGER PRIMARY KEY,
+        task_id TEXT NOT NULL UNIQUE,
+        project_id INTEGER NOT NULL,
+        article TEXT,
+        extracted TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_task_search_docs_project_id ON task_search_docs (project_id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(
+        article, extracted,
+        content='task_search_docs', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_search_docs_ai AFTER INSERT ON task_search_docs BEGIN
+        INSERT INTO task_search(rowid, article, extracted) VALUES (new.rowid, new.article, new.extracted);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_search_docs_ad AFTER DELETE ON task_search_docs BEGIN
+        INSERT INTO task_search(task_search, rowid, article, extracted)
+        VALUES ('delete', old.rowid, old.article, old.extracted);
+    END
+    """,
+]
+
+# Postgres: a weighted tsvector per task behind a GIN index
+_POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_search (
+        task_id TEXT PRIMARY KEY,
+        project_id INTEGER NOT NULL,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_task_search_document ON task_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_task_search_project_id ON task_search (project_id)",
+]
+
+
+def ensure_search_index(engine: Engine):
+    ddl = {"sqlite": _SQLITE_DDL, "postgresql": _POSTGRES_DDL}.get(engine.dialect.name, [])
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def extracted_text(events: list[dict]) -> str:
+    # Trigger and argument spans of parsed events, searchable alongside the article
+    parts = []
+    for event in events:
+        parts.append(event["trigger"]["text"])
+        parts.extend(arg["text"] for arg in event["arguments"])
+    return " ".join(part for part in parts if part)
+
+
+def _review_text(db: Session, task_ids: list[str]) -> dict:
+    # Spans from reviewers' current events, read from the normalized event tables
+    texts = {}
+    rows = (
+        db.query(models.Event.task_id, models.Event.trigger, models.EventArgument.text)
+        .outerjoin(models.EventArgument, models.EventArgument.event_id == models.Event.id)
+        .filter(models.Event.task_id.in_(task_ids), models.Event.review_id.is_not(None))
+    )
+    for task_id, trigger, argument in rows:
+        texts.setdefault(task_id, []).extend(t for t in (trigger, argument) if t)
+    return {task_id: " ".join(parts) for task_id, parts in texts.items()}
+
+
+def index_tasks(db: Session, tasks: list[dict]):
+    # `tasks` are rows with id/project_id/article/events (and maybe "parsed",
+    # see events.row_events); callers commit
+    dialect = _dialect(db)
+    if not tasks or dialect not in ("sqlite", "postgresql"):
+        return
+    task_ids = [task["id"] for task in tasks]
+    db.flush()  # review events written earlier in this transaction must be visible
+    reviewed = _review_text(db, task_ids)
+    docs = [
+        {
+            "task_id": task["id"],
+            "project_id": task["project_id"],
+            "article": task["article"] or "",
+            "extracted": " ".join(
+                t for t in (extracted_text(row_events(task)), reviewed.get(task["id"])) if t
+            ),
+        }
+        for task in tasks
+    ]
+
+    table = "task_search_docs" if dialect == "sqlite" else "task_search"
+    db.execute(
+        text(f"DELETE FROM {table} WHERE task_id IN :task_ids").bindparams(
+            bindparam("task_ids", expanding=True)
+        ),
+        {"task_ids": task_ids},
+    )
+    if dialect == "sqlite":
+        insert = text(
+            "INSERT INTO task_search_docs (task_id, project_id, article, extracted) "
+            "VALUES (:task_id, :project_id, :article, :extracted)"
+        )
+    else:
+        insert = text(
+            "INSERT INTO task_search (task_id, project_id, document) VALUES ("
+            f":task_id, :project_id, "
+            f"setweight(to_tsvector('{TS_CONFIG}', :extracted), 'A') || "
+            f"setweight(to_tsvector('{TS_CONFIG}', :article), 'B'))"
+        )
+    db.execute(insert, docs)
+
+
+def index_task(db: Session, task: models.Task):
+    index_tasks(db, [{"id": task.id, "project_id": task.project_id, "article": task.article, "events": task.events}])
+
+
+def delete_tasks(db: Session, task_ids: list[str]):
+    dialect = _dialect(db)
+    if dialect not in ("sqlite", "postgresql"):
+        return
+    table = "task_search_docs" if dialect == "sqlite" else "task_search"
+    db.execute(
+        text(f"DELETE FROM {table} WHERE task_id IN :task_ids").bindparams(
+            bindparam("task_ids", expanding=True)
+        ),
+        {"task_ids": task_ids},
+    )
+
+
+def delete_project(db: Session, project_id: int):
+    dialect = _dialect(db)
+    if dialect in ("sqlite", "postgresql"):
+        table = "task_search_docs" if dialect == "sqlite" else "task_search"
+        db.execute(text(f"DELETE FROM {table} WHERE project_id = :project_id"), {"project_id": project_id})
+
+
+def reindex_project(db: Session, project_id: int, batch_size: int = 500) -> int:
+    tasks = db.query(models.Task).filter(models.Task.project_id == project_id).order_by(models.Task.id)
+    count = 0
+    batch = []
+    for task in tasks.yield_per(batch_size):
+        batch.append({"id": task.id, "project_id": task.project_id, "article": task.article, "events": task.events})
+        if len(batch) >= batch_size:
+            index_tasks(db, batch)
+            count += len(batch)
+            batch = []
+    index_tasks(db, batch)
+    count += len(batch)
+    db.commit()
+    return count
+
+
+def search_tasks(db: Session, project_id: int, q: str, skip: int = 0, limit: int = 20):
+    words = _WORD_RE.findall(q)
+    if not words:
+        return [], 0
+    dialect = _dialect(db)
+    params = {"project_id": project_id, "skip": skip, "limit": limit}
+
+    if dialect == "sqlite":
+        # Each word is quoted so user input can't inject FTS5 query syntax
+        params["q"] = " ".join('"%s"' % word for word in words)
+        match = (
+            "FROM task_search JOIN task_search_docs d ON d.rowid = task_search.rowid "
+            "WHERE task_search MATCH :q AND d.project_id = :project_id"
+        )
+        rows = db.execute(text(
+            "SELECT d.task_id, -bm25(task_search, 1.0, 2.0) AS score, "
+            "snippet(task_search, 0, '[', ']', '...', 16) AS snippet "
+            f"{match} ORDER BY bm25(task_search, 1.0, 2.0) LIMIT :limit OFFSET :skip"
+        ), params).all()
+        total = db.execute(text(f"SELECT count(*) {match}"), params).scalar()
+    elif dialect == "postgresql":
+        params["q"] = " ".join(words)
+        query = f"plainto_tsquery('{TS_CONFIG}', :q)"
+        match = f"FROM task_search s WHERE s.project_id = :project_id AND s.document @@ {query}"
+        page = db.execute(text(
+            f"SELECT s.task_id, ts_rank_cd(s.document, {query}) AS score "
+            f"{match} ORDER BY score DESC, s.task_id LIMIT :limit OFFSET :skip"
+        ), params).all()
+        total = db.execute(text(f"SELECT count(*) {match}"), params).scalar()
+        # Headlines only for the page, as they re-parse the article
+        snippets = {}
+        if page:
+            snippets = dict(db.execute(
+                text(
+                    f"SELECT t.id, ts_headline('{TS_CONFIG}', t.article, {query}, "
+                    "'StartSel=[, StopSel=], MaxFragments=1, MaxWords=24') "
+                    "FROM tasks t WHERE t.id IN :ids"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {**params, "ids": [row[0] for row in page]},
+            ).all())
+        rows = [(task_id, score, snippets.get(task_id)) for task_id, score in page]
+    else:
+        # No full-text engine: AND of substring matches over the article
+        query = db.query(models.Task.id).filter(models.Task.project_id == project_id)
+        for word in words:
+            query = query.filter(models.Task.article.ilike(f"%{word}%"))
+        total = query.count()
+        rows = [(task_id, 0.0, None) for (task_id,) in query.order_by(models.Task.id).offset(skip).limit(limit)]
+
+    return [{"task_id": task_id, "score": float(score), "snippet": snippet} for task_id, score, snippet in rows], total
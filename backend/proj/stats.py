@@ -0,0 +1,227 @@
+from collections import Counter
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.proj import models
+from backend.proj.assignment import ANNOTATORS_PER_TASK
+
+# Counters are moved with `col = col + delta` in the writer's transaction, so a
+# dashboard read is a primary-key lookup however large the project is.
+
+
+def _bump(db: Session, model, key: dict, **deltas):
+    if not any(deltas.values()):
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        db.execute(insert(model.__table__).values(**key).on_conflict_do_nothing())
+    elif db.get(model, tuple(key.values())) is None:
+        db.add(model(**key))
+        db.flush()
+    criteria = [getattr(model, column) == value for column, value in key.items()]
+    db.execute(
+        update(model)
+        .where(*criteria)
+        .values({getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items() if delta})
+    )
+
+
+def _bump_project(db: Session, project_id: int, **deltas):
+    _bump(db, models.ProjectStats, {"project_id": project_id}, **deltas)
+
+
+def _bump_reviewer(db: Session, project_id: int, reviewer_id: int, **deltas):
+    _bump(db, models.ReviewerStats, {"project_id": project_id, "reviewer_id": reviewer_id}, **deltas)
+
+
+def _reviewers(db: Session, task_id: str) -> int:
+    return (
+        db.query(func.count(func.distinct(models.Review.reviewer_id)))
+        .filter(models.Review.task_id == task_id)
+        .scalar()
+    )
+
+
+def _quota(db: Session, task_id: str) -> int:
+    # Reviewers the task should get, as set in its queue entry
+    quota = db.query(models.TaskQueue.quota).filter(models.TaskQueue.task_id == task_id).scalar()
+    return ANNOTATORS_PER_TASK if quota is None else quota
+
+
+def _reviews_by(db: Session, task_id: str, reviewer_id: int) -> int:
+    return (
+        db.query(func.count())
+        .select_from(models.Review)
+        .filter(models.Review.task_id == task_id, models.Review.reviewer_id == reviewer_id)
+        .scalar()
+    )
+
+
+def tasks_written(db: Session, tasks: list[dict]):
+    # Called before `tasks` (rows with id/project_id) are inserted or upserted:
+    # only ids that are new to a project count
+    if not tasks:
+        return
+    existing = dict(
+        db.query(models.Task.id, models.Task.project_id).filter(models.Task.id.in_([t["id"] for t in tasks]))
+    )
+    delta = Counter()
+    for task in tasks:
+        before = existing.get(task["id"])
+        if before != task["project_id"]:
+            delta[task["project_id"]] += 1
+            if before is not None:
+                delta[before] -= 1
+    # Rewritten tasks change what the project's caches hold even when the count doesn't move
+    for project_id in {task["project_id"] for task in tasks} | delta.keys():
+        _bump_project(db, project_id, tasks=delta[project_id], version=1)
+
+
+def task_deleted(db: Session, task: models.Task):
+    # Reviews of a deleted task stay in the table but no longer count for the project
+    per_reviewer = dict(
+        db.query(models.Review.reviewer_id, func.count())
+        .filter(models.Review.task_id == task.id)
+        .group_by(models.Review.reviewer_id)
+    )
+    _bump_project(
+        db,
+        task.project_id,
+        tasks=-1,
+        reviews=-sum(per_reviewer.values()),
+        reviewed_tasks=-1 if per_reviewer else 0,
+        completed_tasks=-1 if per_reviewer and len(per_reviewer) >= _quota(db, task.id) else 0,
+        version=1,
+    )
+    for reviewer_id, count in per_reviewer.items():
+        _bump_reviewer(db, task.project_id, reviewer_id, reviews=-count, tasks=-1)
+
+
+def review_added(db: Session, task: models.Task, reviewer_id: int):
+    # Called once the review is flushed
+    first = _reviews_by(db, task.id, reviewer_id) == 1
+    reviewers = _reviewers(db, task.id) if first else 0
+    _bump_project(
+        db,
+        task.project_id,
+        reviews=1,
+        reviewed_tasks=1 if reviewers == 1 else 0,
+        completed_tasks=1 if reviewers and reviewers == _quota(db, task.id) else 0,
+        version=1,
+    )
+    _bump_reviewer(db, task.project_id, reviewer_id, reviews=1, tasks=1 if first else 0)
+
+
+def review_removed(db: Session, task: models.Task, reviewer_id: int):
+    # Called once the deletion is flushed
+    last = _reviews_by(db, task.id, reviewer_id) == 0
+    reviewers = _reviewers(db, task.id) if last else None
+    _bump_project(
+        db,
+        task.project_id,
+        reviews=-1,
+        reviewed_tasks=-1 if reviewers == 0 else 0,
+        completed_tasks=-1 if reviewers is not None and reviewers == _quota(db, task.id) - 1 else 0,
+        version=1,
+    )
+    _bump_reviewer(db, task.project_id, reviewer_id, reviews=-1, tasks=-1 if last else 0)
+
+
+def touch(db: Session, project_id: int):
+    # For writes that change what the project's caches hold without moving a
+    # counter (edited reviews, rebuilt tables); callers commit
+    _bump_project(db, project_id, version=1)
+
+
+def data_version(db: Session, project_id: int) -> int | None:
+    # What cached entries are checked against; None for unknown projects
+    return db.query(models.ProjectStats.version).filter(models.ProjectStats.project_id == project_id).scalar()
+
+
+def delete_project(db: Session, project_id: int):
+    db.query(models.ProjectStats).filter(models.ProjectStats.project_id == project_id).delete(synchronize_session=False)
+    db.query(models.ReviewerStats).filter(models.ReviewerStats.project_id == project_id).delete(synchronize_session=False)
+
+
+def rebuild_project_stats(db: Session, project_id: int) -> int:
+    # Recounts from scratch, e.g. for projects created before the counters existed;
+    # returns the number of counter rows written (the project's plus one per reviewer)
+    version = data_version(db, project_id) or 0
+    delete_project(db, project_id)
+    tasks = db.query(func.count()).select_from(models.Task).filter(models.Task.project_id == project_id).scalar()
+    per_pair = (
+        db.query(models.Review.task_id, models.Review.reviewer_id, func.count())
+        .join(models.Task, models.Task.id == models.Review.task_id)
+        .filter(models.Task.project_id == project_id)
+        .group_by(models.Review.task_id, models.Review.reviewer_id)
+        .all()
+    )
+    reviewers_per_task = Counter(task_id for task_id, _, _ in per_pair)
+    quotas = dict(
+        db.query(models.TaskQueue.task_id, models.TaskQueue.quota).filter(models.TaskQueue.project_id == project_id)
+    )
+    reviews, reviewer_tasks = Counter(), Counter()
+    for _, reviewer_id, count in per_pair:
+        reviews[reviewer_id] += count
+        reviewer_tasks[reviewer_id] += 1
+
+    db.add(models.ProjectStats(
+        project_id=project_id,
+        tasks=tasks,
+        reviewed_tasks=len(reviewers_per_task),
+        completed_tasks=sum(
+            1 for task_id, n in reviewers_per_task.items() if n >= quotas.get(task_id, ANNOTATORS_PER_TASK)
+        ),
+        reviews=sum(reviews.values()),
+        version=version + 1,
+    ))
+    db.add_all(
+        models.ReviewerStats(
+            project_id=project_id, reviewer_id=reviewer_id, reviews=reviews[reviewer_id], tasks=reviewer_tasks[reviewer_id]
+        )
+        for reviewer_id in reviews
+    )
+    db.commit()
+    return 1 + len(reviews)
+
+
+def project_created(db: Session, project_id: int):
+    # Counters start at zero with the project; callers commit
+    db.add(models.ProjectStats(project_id=project_id))
+
+
+def backfill(db: Session):
+    # Projects from before the counters existed are counted once at startup
+    missing = (
+        db.query(models.Project.id)
+        .outerjoin(models.ProjectStats, models.ProjectStats.project_id == models.Project.id)
+        .filter(models.ProjectStats.project_id.is_(None))
+        .all()
+    )
+    for (project_id,) in missing:
+        rebuild_project_stats(db, project_id)
+
+
+def get_project_stats(db: Session, project_id: int) -> dict | None:
+    # None for unknown projects
+    row = db.get(models.ProjectStats, project_id)
+    if row is None:
+        return None
+    reviewers = (
+        db.query(models.ReviewerStats)
+        .filter(models.ReviewerStats.project_id == project_id, models.ReviewerStats.reviews > 0)
+        .order_by(models.ReviewerStats.reviewer_id)
+        .all()
+    )
+    return {
+        "project_id": project_id,
+        "tasks": row.tasks,
+        "reviewed_tasks": row.reviewed_tasks,
+        "completed_tasks": row.completed_tasks,
+        "annotators_per_task": ANNOTATORS_PER_TASK,
+        "reviews": row.reviews,
+        "reviewers": reviewers,
+        "updated_at": row.updated_at,
+    }
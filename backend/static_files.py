@@ -0,0 +1,68 @@
+import mimetypes
+import os
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# Served variants, best first: (Content-Encoding, file suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Vite puts content-hashed bundles under assets/: a changed file gets a new name
+HASHED_PREFIX = "assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"  # index.html and friends: always check the ETag
+
+
+def _accepted(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) <= 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    # StaticFiles that picks a prebuilt .br/.gz variant per Accept-Encoding and
+    # sets caching headers; ETags come from the variant's own stat, so each
+    # encoding revalidates separately
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        path = self.get_path(scope).replace(os.sep, "/")
+
+        response = None
+        vary = False
+        accepted = _accepted(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            vary = True
+            if encoding in accepted:
+                response = FileResponse(
+                    full_path + suffix,
+                    status_code=status_code,
+                    stat_result=variant_stat,
+                    # media type of the original, not of the .gz/.br file
+                    media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+                )
+                response.headers["content-encoding"] = encoding
+                break
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        if vary:
+            response.headers["vary"] = "Accept-Encoding"
+        if status_code == 200:
+            response.headers["cache-control"] = IMMUTABLE if path.startswith(HASHED_PREFIX) else REVALIDATE
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
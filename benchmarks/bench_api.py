@@ -0,0 +1,226 @@
+# End-to-end latency and throughput of the main API paths on a synthetic corpus,
+# driven in-process through TestClient: upload_task_file, get_tasks,
+# create_review and export_review. Each backend runs in its own interpreter,
+# since backend.database binds its engine at import time.
+#
+#   python -m benchmarks.bench_api [--backends sqlite,postgres] [--articles 2000]
+#       [--events 5] [--reviewers 3] [--save-baseline] [--tolerance 0.5]
+#
+# Postgres is reached through --postgres-url / BENCH_POSTGRES_URL and must be a
+# scratch database: each run adds a project, users and tasks with fresh ids.
+# Exits 1 when a result is worse than benchmarks/baselines.json by more than
+# the tolerance; baselines are only comparable on the machine that recorded them.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.corpus import make_corpus, review_events, to_jsonl
+
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+POSTGRES_URL = os.getenv("BENCH_POSTGRES_URL", "postgresql://localhost/ee_review_bench")
+CONFIG_KEYS = ("articles", "events", "reviewers", "review_tasks", "upload_rows", "pages", "exports", "seed")
+
+
+def percentile(samples: list[float], q: float) -> float:
+    # Nearest-rank, so p99 of few samples is the slowest one rather than an interpolation
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(samples: list[float], items: int) -> dict:
+    elapsed = sum(samples)
+    return {
+        "requests": len(samples),
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    response = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    assert response.status_code < 300, (response.status_code, response.text[:200])
+    return response, elapsed
+
+
+# ---- one backend (child process) ----
+
+def run_backend(args) -> dict:
+    os.environ["DATABASE_URL"] = args.database_url
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    run = f"{int(time.time())}{os.getpid()}"
+    rng = random.Random(args.seed)
+
+    def login(name):
+        client.post("/api/v1/auth/register", json={"username": name, "password": "bench"})
+        token = client.post("/api/v1/auth/login", data={"username": name, "password": "bench"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    owner = login(f"bench-owner-{run}")
+    reviewers = [login(f"bench-reviewer-{run}-{i}") for i in range(args.reviewers)]
+    project_id = client.post("/api/v1/projects", json={"name": f"bench-{run}"}, headers=owner).json()["id"]
+    base = f"/api/v1/projects/{project_id}"
+    corpus = make_corpus(args.articles, args.events, seed=args.seed, prefix=f"b{run}")
+    results = {}
+
+    samples = []
+    for start in range(0, len(corpus), args.upload_rows):
+        body = to_jsonl(corpus[start:start + args.upload_rows])
+        _, elapsed = timed(
+            client.post, f"{base}/tasks/upload", files={"file": ("corpus.jsonl", body)}, headers=owner
+        )
+        samples.append(elapsed)
+    results["upload"] = summarize(samples, len(corpus))
+
+    samples, items = [], 0
+    pages = max(1, args.articles // 100)
+    for i in range(args.pages):
+        headers = reviewers[i % len(reviewers)] if reviewers else owner
+        params = {"skip": rng.randrange(pages) * 100, "limit": 100}
+        if i % 2:
+            params["status"] = "false"
+        response, elapsed = timed(client.get, f"{base}/tasks", params=params, headers=headers)
+        samples.append(elapsed)
+        items += len(response.json()["tasks"])
+    results["list_tasks"] = summarize(samples, items)
+
+    samples = []
+    for task in corpus[:args.review_tasks]:
+        for headers in reviewers:
+            body = {"events": review_events(rng, task["events"]), "comment": "bench"}
+            _, elapsed = timed(client.post, f"{base}/tasks/{task['id']}/review", json=body, headers=headers)
+            samples.append(elapsed)
+    if samples:
+        results["create_review"] = summarize(samples, len(samples))
+
+    samples, items = [], 0
+    for _ in range(args.exports):
+        response, elapsed = timed(client.get, f"{base}/export", headers=owner)
+        samples.append(elapsed)
+        items += response.content.count(b"\n")  # only reviewed tasks are exported
+    results["export"] = summarize(samples, items)
+    return results
+
+
+# ---- orchestration and baselines ----
+
+def database_url(backend: str, args, tmp: str) -> str:
+    if backend == "sqlite":
+        return f"sqlite:///{tmp}/bench.db"
+    if backend == "postgres":
+        return args.postgres_url
+    raise SystemExit(f"unknown backend: {backend}")
+
+
+def postgres_available(url: str) -> bool:
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import SQLAlchemyError
+    try:
+        with create_engine(url).connect():
+            return True
+    except (SQLAlchemyError, ImportError):
+        return False
+
+
+def run_child(backend: str, args, tmp: str) -> dict:
+    output = Path(tmp) / f"{backend}.json"
+    command = [
+        sys.executable, "-m", "benchmarks.bench_api",
+        "--child", "--database-url", database_url(backend, args, tmp), "--output", str(output),
+    ]
+    for key in CONFIG_KEYS:
+        command += [f"--{key.replace('_', '-')}", str(getattr(args, key))]
+    subprocess.run(command, check=True, cwd=Path(__file__).resolve().parent.parent)
+    return json.loads(output.read_text())
+
+
+def compare(backend: str, results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for op, current in results.items():
+        expected = baseline.get(op)
+        if not expected:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if current[key] > expected[key] * (1 + tolerance):
+                regressions.append(f"{backend} {op} {key}: {current[key]:.1f} vs baseline {expected[key]:.1f}")
+        if current["items_per_sec"] < expected["items_per_sec"] / (1 + tolerance):
+            regressions.append(
+                f"{backend} {op} items/s: {current['items_per_sec']:.0f} vs baseline {expected['items_per_sec']:.0f}"
+            )
+    return regressions
+
+
+def print_results(backend: str, results: dict):
+    print(f"\n{backend}")
+    print(f"  {'operation':<14}{'requests':>9}{'items/s':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    for op, r in results.items():
+        print(f"  {op:<14}{r['requests']:>9}{r['items_per_sec']:>11.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="sqlite", help="comma-separated: sqlite,postgres")
+    parser.add_argument("--postgres-url", default=POSTGRES_URL)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=5, help="events per article")
+    parser.add_argument("--reviewers", type=int, default=3, help="reviewers per reviewed task")
+    parser.add_argument("--review-tasks", type=int, default=200, help="tasks that get reviewed")
+    parser.add_argument("--upload-rows", type=int, default=500, help="rows per uploaded file")
+    parser.add_argument("--pages", type=int, default=200, help="task list requests")
+    parser.add_argument("--exports", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--database-url", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        Path(args.output).write_text(json.dumps(run_backend(args)))
+        return
+
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    comparable = stored.get("config") == config
+    if stored and not comparable and not args.save_baseline:
+        print(f"baseline was recorded with {stored.get('config')}; not comparing")
+
+    regressions = []
+    measured = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(","):
+            if backend == "postgres" and not postgres_available(args.postgres_url):
+                print(f"\npostgres: skipped, cannot connect to {args.postgres_url}")
+                continue
+            measured[backend] = run_child(backend, args, tmp)
+            print_results(backend, measured[backend])
+            if comparable and not args.save_baseline:
+                regressions += compare(backend, measured[backend], stored["results"].get(backend, {}), args.tolerance)
+
+    if args.save_baseline:
+        results = stored.get("results", {}) if comparable else {}
+        results.update(measured)
+        args.baseline.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+        print(f"\nbaseline written to {args.baseline}")
+    elif regressions:
+        print("\nregressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
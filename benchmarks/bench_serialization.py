@@ -0,0 +1,77 @@
+# Per-page CPU cost of serializing GET /projects/{id}/tasks: the pydantic
+# TaskListOut path (decode events, validate, re-encode) vs backend.proj.fastjson.
+#
+#   python -m benchmarks.bench_serialization [--tasks 100] [--events 20] [--pages 200]
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from backend.proj import fastjson, schemas
+from backend.proj.events import EVENT_ROLES
+
+
+def make_page(tasks: int, events: int):
+    rng = random.Random(0)
+    page = []
+    for i in range(tasks):
+        task_events = []
+        for _ in range(events):
+            event_type = rng.choice(list(EVENT_ROLES))
+            task_events.append({
+                "event_type": event_type,
+                "trigger": {"text": rng.choice(["reported", "died", "confirmed", "spread"])},
+                "arguments": [
+                    {"role": role, "text": f"{role} span {rng.randint(0, 999)}"}
+                    for role in EVENT_ROLES[event_type]
+                ],
+            })
+        page.append(SimpleNamespace(
+            id=f"task-{i:06d}",
+            project_id=1,
+            article="Health officials confirmed new cholera cases. " * 40,
+            events=json.dumps(task_events),
+            status=bool(i % 2),
+        ))
+    return page
+
+
+def pydantic_page(page):
+    # What FastAPI does with response_model=TaskListOut and a dict return value
+    out = schemas.TaskListOut.model_validate({"tasks": page, "total": len(page)}, from_attributes=True)
+    return json.dumps(out.model_dump(mode="json")).encode("utf-8")
+
+
+def fast_page(page):
+    return fastjson.task_list_response(page, total=len(page)).body
+
+
+def cpu_per_page(fn, page, pages: int) -> float:
+    fn(page)  # warm up
+    start = time.process_time()
+    for _ in range(pages):
+        fn(page)
+    return (time.process_time() - start) / pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    page = make_page(args.tasks, args.events)
+    assert json.loads(fast_page(page)) == json.loads(pydantic_page(page))
+
+    slow = cpu_per_page(pydantic_page, page, args.pages)
+    fast = cpu_per_page(fast_page, page, args.pages)
+    print(f"page: {args.tasks} tasks x {args.events} events, {len(fast_page(page)) / 1024:.0f} KiB")
+    print(f"pydantic: {slow * 1000:8.2f} ms CPU/page")
+    print(f"fastjson: {fast * 1000:8.2f} ms CPU/page")
+    print(f"saved:    {(slow - fast) * 1000:8.2f} ms CPU/page ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
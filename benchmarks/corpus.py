@@ -0,0 +1,84 @@
+# Synthetic epidemic corpora for the benchmarks: articles with LLM-style events
+# drawn from the guideline event types and roles, and reviewer edits of them.
+import json
+import random
+
+from backend.proj.events import EVENT_ROLES
+
+DISEASES = ["cholera", "dengue fever", "measles", "influenza A", "mpox", "malaria", "typhoid"]
+PLACES = ["Kandal province", "Phnom Penh", "Takeo", "Battambang", "Siem Reap", "Kampot", "Kratie"]
+TRIGGERS = {
+    "Infect": ["infected", "contracted", "tested positive"],
+    "Spread": ["spread", "outbreak", "surge"],
+    "Symptom": ["fever", "vomiting", "rash"],
+    "Prevent": ["vaccinated", "vaccination campaign", "distributed bed nets"],
+    "Control": ["quarantined", "closed", "lockdown"],
+    "Cure": ["recovered", "discharged", "treated"],
+    "Death": ["died", "deaths", "killed"],
+}
+FILLER = (
+    "Health officials said the situation was being monitored closely and urged residents "
+    "to seek care early. Local clinics reported a steady stream of patients over the week."
+)
+
+
+def _argument_text(rng: random.Random, role: str, disease: str, place: str) -> str:
+    if role == "disease":
+        return disease
+    if role == "place":
+        return place
+    if role in ("value", "population"):
+        return f"{rng.randint(2, 900)} people"
+    if role in ("time", "duration"):
+        return rng.choice(["last week", "on Monday", "since June", "for ten days"])
+    if role == "information-source":
+        return rng.choice(["the Ministry of Health", "provincial health department", "WHO"])
+    return f"{role.replace('-', ' ')} {rng.randint(1, 99)}"
+
+
+def make_task(rng: random.Random, index: int, events: int, prefix: str = "bench") -> dict:
+    disease, place = rng.choice(DISEASES), rng.choice(PLACES)
+    sentences, task_events = [], []
+    for _ in range(events):
+        event_type = rng.choice(list(EVENT_ROLES))
+        trigger = rng.choice(TRIGGERS[event_type])
+        roles = rng.sample(EVENT_ROLES[event_type], k=min(3, len(EVENT_ROLES[event_type])))
+        arguments = [{"role": role, "text": _argument_text(rng, role, disease, place)} for role in roles]
+        # Every span appears in the article, as it would in real extractions
+        sentences.append(f"{arguments[0]['text']} {trigger} " + ", ".join(a["text"] for a in arguments[1:]) + ".")
+        task_events.append({"event_type": event_type, "trigger": {"text": trigger}, "arguments": arguments})
+    return {
+        "id": f"{prefix}-{index:07d}",
+        "text": " ".join(sentences) + " " + FILLER,
+        "events": task_events,
+    }
+
+
+def make_corpus(articles: int, events: int, seed: int = 0, prefix: str = "bench") -> list[dict]:
+    # Same seed, same corpus; `prefix` keeps task ids of separate runs apart
+    rng = random.Random(seed)
+    return [make_task(rng, i, events, prefix) for i in range(articles)]
+
+
+def to_jsonl(tasks: list[dict]) -> bytes:
+    return "\n".join(json.dumps(task) for task in tasks).encode("utf-8")
+
+
+def review_events(rng: random.Random, events: list[dict]) -> str:
+    # A reviewer's take on the LLM output: most spans kept, some corrected,
+    # retyped or dropped, the way the review UI submits them
+    reviewed = []
+    for event in events:
+        if rng.random() < 0.1:
+            continue
+        event_type = event["event_type"]
+        if rng.random() < 0.1:
+            event_type = rng.choice(list(EVENT_ROLES))
+        arguments = []
+        for arg in event["arguments"]:
+            arg = dict(arg)
+            if rng.random() < 0.15:
+                arg.update(incorrect=True, correction=arg["text"].split(" ")[0])
+            arguments.append(arg)
+        reviewed.append({"event_type": event_type, "trigger": dict(event["trigger"]), "arguments": arguments})
+    return json.dumps(reviewed)